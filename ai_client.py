@@ -0,0 +1,209 @@
+import os
+import json
+import math
+import hashlib
+import threading
+from .config import Config
+from .database import get_ai_response, save_ai_response, log_error
+from .http_client import http_client
+from .metrics import metrics
+
+DEFAULT_API_URL = "https://api.deepseek.com/v1/chat/completions"
+SYSTEM_PROMPT = "You are a professional crypto trader. Provide detailed analysis."
+UNAVAILABLE = "❌ AI service unavailable"
+BUSY = "❌ AI service is busy, please try again in a minute"
+NO_ANSWER = "❌ Failed to get AI recommendation"
+
+def format_price(value, digits=3):
+    """A price for an AI context, rounded to `digits` significant digits.
+
+    Contexts built with it share a cache key while the price only moves in
+    its noise; other numbers (years, quantities) are keyed as written.
+    """
+    value = float(value)
+    if not value:
+        return '0'
+    decimals = digits - 1 - math.floor(math.log10(abs(value)))
+    return f"{round(value, decimals):.{max(decimals, 0)}f}"
+
+
+def normalize_context(context):
+    # Only case and whitespace: any other difference may be a different question
+    return ' '.join(context.lower().split())
+
+
+class _Answer:
+    """Chunks of one answer as they are generated; each reader follows at its own pace."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.condition = threading.Condition()
+
+    def put(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def __iter__(self):
+        position = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: position < len(self.chunks) or self.done)
+                chunks = self.chunks[position:]
+                position = len(self.chunks)
+            if not chunks:
+                return
+            # Outside the lock: a slow reader never holds up the writer or other readers
+            yield from chunks
+
+
+class DeepSeekClient:
+    """Chat-completions client for trading recommendations.
+
+    Answers are cached in SQLite under a hash of the normalised context, so the
+    same question from different users within cache_ttl costs one request
+    (prices in the context should be formatted with format_price).
+    Each request runs in its own thread and holds one of max_concurrency
+    slots only while the API streams; readers take the buffered chunks at
+    their own pace. Identical concurrent questions read the same answer.
+    """
+
+    def __init__(self, api_url=None, api_key=None, model='deepseek-chat', cache_ttl=900,
+                 max_concurrency=2, queue_timeout=30, timeout=60, max_tokens=2000):
+        config = Config()
+        self.api_url = api_url or config.get('deepseek_api_url', DEFAULT_API_URL)
+        self.api_key = api_key
+        self.model = model
+        self.cache_ttl = cache_ttl
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}     # cache key -> _Answer being generated
+        self._inflight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        metrics.register_cache('ai_responses', self)
+
+    def cache_key(self, context):
+        raw = f"{self.model}\n{SYSTEM_PROMPT}\n{normalize_context(context)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _request(self, context, stream):
+        headers = {
+            "Authorization": f"Bearer {self.api_key or os.getenv('DEEPSEEK_API_KEY')}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": context}
+            ],
+            "temperature": 0.7,
+            "max_tokens": self.max_tokens,
+            "stream": stream
+        }
+        response = http_client.post(self.api_url, json=payload, headers=headers,
+                                    timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def _stream_tokens(self, response):
+        # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            choices = json.loads(data).get('choices') or [{}]
+            token = choices[0].get('delta', {}).get('content')
+            if token:
+                yield token
+
+    def _generate(self, key, context, answer):
+        try:
+            if not self.semaphore.acquire(timeout=self.queue_timeout):
+                log_error("AI_API", f"No free slot within {self.queue_timeout}s")
+                answer.put(BUSY)
+                return
+            parts = []
+            try:
+                with metrics.timer('ai.chat_completion'):
+                    response = self._request(context, stream=True)
+                    try:
+                        for token in self._stream_tokens(response):
+                            parts.append(token)
+                            answer.put(token)
+                    finally:
+                        response.close()
+            except Exception as e:
+                log_error("AI_API", f"Error: {e}")
+                # A partial answer is shown but not cached
+                answer.put("\n\n❌ Response interrupted" if parts else UNAVAILABLE)
+                return
+            finally:
+                self.semaphore.release()
+
+            if parts:
+                # Cached before the key leaves _inflight, so a new reader finds one or the other
+                save_ai_response(key, ''.join(parts))
+            else:
+                answer.put(NO_ANSWER)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            answer.finish()
+
+    def stream(self, context):
+        """Yields the answer in chunks as they are generated (the cached answer as one chunk)."""
+        key = self.cache_key(context)
+        cached = get_ai_response(key, self.cache_ttl)
+        if cached is not None:
+            self.hits += 1
+            yield cached
+            return
+
+        with self._inflight_lock:
+            answer = self._inflight.get(key)
+            joined = answer is not None
+            if not joined:
+                # Cached since the check above, by a request that has just finished
+                cached = get_ai_response(key, self.cache_ttl)
+                if cached is None:
+                    answer = self._inflight[key] = _Answer()
+                    threading.Thread(target=self._generate, args=(key, context, answer),
+                                     name='ai-answer', daemon=True).start()
+        if answer is None:
+            self.hits += 1
+            yield cached
+            return
+        if joined:
+            self.hits += 1
+        else:
+            self.misses += 1
+        yield from answer
+
+    def recommend(self, context):
+        return ''.join(self.stream(context))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ai_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = Config()
+            _client = DeepSeekClient(cache_ttl=config.get('ai_cache_ttl', 900),
+                                     max_concurrency=config.get('ai_max_concurrency', 2))
+        return _client
@@ -1,24 +1,37 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
 from datetime import datetime, timedelta
 import logging
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
-from textblob import TextBlob
-import re
 import time
 
+# analysis импортируется и из пакета сервиса (monitoring), и как модуль верхнего уровня (CLI);
+# в сервисе тайминги должны попадать в тот же реестр metrics, что отдаёт /stats
+try:
+    from .metrics import StageTimer, timed
+    from .config import Config
+    from .features import feature_store, resolve_features, inverse_target, TARGET_COLUMN
+    from .forecasters import get_forecaster, resolve_backend, BASELINE_BACKEND
+    from .news import news_service, news_query
+    from .http_client import http_client
+    from .forecast_cache import forecast_cache, model_version
+except ImportError:
+    from metrics import StageTimer, timed
+    from config import Config
+    from features import feature_store, resolve_features, inverse_target, TARGET_COLUMN
+    from forecasters import get_forecaster, resolve_backend, BASELINE_BACKEND
+    from news import news_service, news_query
+    from http_client import http_client
+    from forecast_cache import forecast_cache, model_version
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
+@timed('analysis.fetch_historical_data', none_is_error=True)
 def fetch_historical_data(symbol='BTC-USD', start_date='2015-01-01', end_date=None):
     """Загружает исторические данные о ценах криптовалюты с Yahoo Finance."""
     try:
@@ -28,7 +41,7 @@ def fetch_historical_data(symbol='BTC-USD', start_date='2015-01-01', end_date=No
         url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?period1={pd.Timestamp(start_date).timestamp():.0f}&period2={pd.Timestamp(end_date).timestamp():.0f}&interval=1d"
         logger.info(f"Загрузка данных для {symbol} с {start_date} по {end_date}")
 
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
+        response = http_client.get(url, timeout=15)
         response.raise_for_status()
         data = response.json()
 
@@ -39,11 +52,14 @@ def fetch_historical_data(symbol='BTC-USD', start_date='2015-01-01', end_date=No
         result = data['chart']['result'][0]
         timestamps = result['timestamp']
         quotes = result['indicators']['quote'][0]
-        closes = quotes['close']
 
         df = pd.DataFrame({
             'Date': pd.to_datetime(timestamps, unit='s'),
-            'Close': closes
+            'Open': quotes['open'],
+            'High': quotes['high'],
+            'Low': quotes['low'],
+            'Close': quotes['close'],
+            'Volume': quotes['volume']
         })
         df.dropna(inplace=True)
         logger.info(f"Успешно загружено {len(df)} записей для {symbol}")
@@ -54,56 +70,39 @@ def fetch_historical_data(symbol='BTC-USD', start_date='2015-01-01', end_date=No
 
 
 def fetch_news_sentiment(query='Bitcoin', num_articles=20):
-    """Собирает новостные статьи и анализирует их тональность."""
-    try:
-        base_url = "https://news.google.com/search?q={}"
-        url = base_url.format(query.replace(' ', '%20'))
-        logger.info(f"Сбор новостей по запросу: {query}")
-
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = soup.find_all('article')[:num_articles]
-
-        sentiments = []
-        for i, article in enumerate(articles):
-            title_elem = article.find('a', class_='DY5T1d')
-            if not title_elem:
-                continue
-
-            title = title_elem.text
-            clean_title = re.sub(r'[^\w\s]', '', title)
+    """Собирает новостные статьи и анализирует их тональность.
 
-            # Анализ тональности
-            analysis = TextBlob(clean_title)
-            sentiment = analysis.sentiment.polarity
-            sentiments.append(sentiment)
-
-            if i < 5:  # Логируем только первые 5 заголовков
-                logger.info(f"Заголовок {i + 1}: {title[:60]}... | Тональность: {sentiment:.2f}")
-
-        avg_sentiment = np.mean(sentiments) if sentiments else 0
-        logger.info(f"Проанализировано {len(sentiments)} статей, средняя тональность: {avg_sentiment:.2f}")
-        return avg_sentiment
+    Источники опрашиваются параллельно, результат кэшируется по запросу
+    (см. news.NewsSentimentService).
+    """
+    try:
+        return news_service.get_sentiment(query, num_articles)
     except Exception as e:
         logger.error(f"Ошибка при сборе новостей: {e}")
         return 0
 
 
-def prepare_data(data, look_back=60):
-    """Подготавливает данные для LSTM модели."""
+def prepare_data(data, look_back=60, features=None, scaler=None):
+    """Подготавливает данные для LSTM модели.
+
+    data — DataFrame с колонками признаков либо готовая матрица признаков.
+    Окна формируются через sliding_window_view без копирования в цикле.
+    """
     try:
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(data['Close'].values.reshape(-1, 1))
+        features = resolve_features(features)
+        if isinstance(data, pd.DataFrame):
+            values = data[features].to_numpy(dtype=np.float32)
+        else:
+            values = np.asarray(data, dtype=np.float32)
 
-        X, y = [], []
-        for i in range(look_back, len(scaled_data)):
-            X.append(scaled_data[i - look_back:i, 0])
-            y.append(scaled_data[i, 0])
+        if scaler is None:
+            scaler = MinMaxScaler(feature_range=(0, 1)).fit(values)
+        scaled_data = scaler.transform(values).astype(np.float32)
 
-        X = np.array(X)
-        y = np.array(y)
-        X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+        target_index = features.index(TARGET_COLUMN)
+        windows = np.lib.stride_tricks.sliding_window_view(scaled_data[:-1], look_back, axis=0)
+        X = np.ascontiguousarray(windows.transpose(0, 2, 1))
+        y = scaled_data[look_back:, target_index]
 
         logger.info(f"Данные подготовлены: X.shape={X.shape}, y.shape={y.shape}")
         return X, y, scaler
@@ -112,16 +111,21 @@ def prepare_data(data, look_back=60):
         raise
 
 
-def build_lstm_model(input_shape):
+def build_lstm_model(input_shape, units=50, dense_units=25, learning_rate=0.001):
     """Строит и компилирует LSTM модель."""
+    # TensorFlow импортируется только когда действительно нужна LSTM модель
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense
+    from tensorflow.keras.optimizers import Adam
+
     try:
         model = Sequential()
-        model.add(LSTM(50, return_sequences=True, input_shape=input_shape))
-        model.add(LSTM(50, return_sequences=False))
-        model.add(Dense(25))
+        model.add(LSTM(units, return_sequences=True, input_shape=input_shape))
+        model.add(LSTM(units, return_sequences=False))
+        model.add(Dense(dense_units))
         model.add(Dense(1))
 
-        model.compile(optimizer='adam', loss='mean_squared_error')
+        model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mean_squared_error')
         logger.info("LSTM модель успешно создана")
         return model
     except Exception as e:
@@ -129,9 +133,20 @@ def build_lstm_model(input_shape):
         raise
 
 
-def perform_full_analysis(symbol='BTC-USD', days_to_predict=30):
-    """Выполняет полный анализ: сбор данных, обучение модели и прогнозирование."""
+def perform_full_analysis(symbol='BTC-USD', days_to_predict=30, features=None, backend=None,
+                          save_results=True):
+    """Выполняет полный анализ: сбор данных, обучение модели и прогнозирование.
+
+    backend — имя прогнозной модели ('lstm', 'ridge', 'ets'); по умолчанию берётся
+    из Config['forecast_backends'] для символа или Config['forecast_backend'].
+    При save_results=False файлы в results/ не пишутся, а PNG графика
+    возвращается в памяти (ключ 'chart_png'), а результат кэшируется до
+    прихода новой свечи или изменения модели (см. forecast_cache): при той же
+    тональности новостей он возвращается сразу, при другой пересчитывается
+    только коррекция прогноза и график, без обучения.
+    """
     start_time = time.time()
+    stages = StageTimer('analysis')
     logger.info(f"Начало анализа для {symbol}")
 
     try:
@@ -141,93 +156,151 @@ def perform_full_analysis(symbol='BTC-USD', days_to_predict=30):
             logger.error(f"Не удалось загрузить данные для {symbol}")
             return None
 
-        # Сбор новостных данных
-        news_sentiment = fetch_news_sentiment()
+        # Сбор новостных данных (по монете символа, из кэша если свежий)
+        news_sentiment = fetch_news_sentiment(news_query(symbol))
         logger.info(f"Средняя тональность новостей: {news_sentiment:.2f}")
+        stages.mark('fetch')
 
-        # Подготовка данных
+        config = Config()
         look_back = 60
-        X, y, scaler = prepare_data(df, look_back)
-
-        # Разделение на обучающую и тестовую выборки
-        train_size = int(len(X) * 0.8)
-        X_train, X_test = X[:train_size], X[train_size:]
-        y_train, y_test = y[:train_size], y[train_size:]
-
-        # Построение и обучение модели
-        model = build_lstm_model((X_train.shape[1], 1))
-        logger.info("Обучение модели...")
-        model.fit(X_train, y_train, batch_size=32, epochs=10, validation_split=0.1, verbose=0)
-        logger.info("Обучение модели завершено")
-
-        # Оценка модели
-        test_predictions = model.predict(X_test)
-        test_predictions = scaler.inverse_transform(test_predictions)
-        y_test_actual = scaler.inverse_transform(y_test.reshape(-1, 1))
-
-        rmse = np.sqrt(mean_squared_error(y_test_actual, test_predictions))
-        logger.info(f"RMSE на тестовых данных: {rmse:.2f}")
-
-        # Прогнозирование будущих цен
-        last_sequence = X_test[-1]
-        future_predictions = []
-
-        logger.info("Прогнозирование будущих цен...")
-        for _ in range(days_to_predict):
-            next_pred = model.predict(last_sequence.reshape(1, look_back, 1), verbose=0)
-            future_predictions.append(next_pred[0, 0])
-            last_sequence = np.append(last_sequence[1:], next_pred[0, 0])
+        features = resolve_features(features or config.get('lstm_features'))
+        backend = resolve_backend(config, symbol, backend)
+        last_candle = df['Date'].iloc[-1]
+
+        cached = None
+        if not save_results:
+            forecast_cache.watch(config)
+            cached = forecast_cache.get(forecast_cache.key(
+                symbol, last_candle, model_version(config, symbol, backend, features, look_back), days_to_predict))
+        if cached and cached['result']['news_sentiment'] == news_sentiment:
+            logger.info(f"Прогноз {symbol} взят из кэша: новых свечей нет, модель не менялась")
+            stages.mark('cache')
+            return dict(cached['result'], processing_time=time.time() - start_time)
+
+        if cached:
+            # Данные и модель те же — обучение не нужно, меняется только коррекция на тональность
+            logger.info(f"Модель {symbol} не менялась, пересчёт прогноза с новой тональностью")
+            scaler, target_index = cached['scaler'], cached['target_index']
+            rmse_by_backend, raw_forecast = cached['rmse_by_backend'], cached['raw_forecast']
+        else:
+            # Подготовка данных (матрица признаков берётся из кэша)
+            matrix = feature_store.get_matrix(symbol, df, features, sentiment=news_sentiment)
+            scaler = matrix.scaler
+            scaled_data = scaler.transform(matrix.values).astype(np.float32)
+            target_index = matrix.target_index
+
+            # Разделение на обучающую и тестовую выборки (индексы целевых свечей)
+            num_samples = len(scaled_data) - look_back
+            train_end = look_back + int(num_samples * 0.8)
+            y_test_actual = inverse_target(scaler, scaled_data[train_end:, target_index], target_index)
+            stages.mark('prepare')
+
+            # Обучение модели и оценка; дешёвый базовый бэкенд считается всегда для сравнения RMSE
+            rmse_by_backend = {}
+            for name in dict.fromkeys([backend, BASELINE_BACKEND]):
+                forecaster = get_forecaster(name, symbol, target_index, look_back, config)
+                logger.info(f"Обучение модели ({name})...")
+                forecaster.fit(scaled_data, train_end)
+                test_predictions = inverse_target(
+                    scaler, forecaster.predict_range(scaled_data, train_end, len(scaled_data)), target_index
+                )
+                rmse_by_backend[name] = float(np.sqrt(mean_squared_error(y_test_actual, test_predictions)))
+                logger.info(f"RMSE на тестовых данных ({name}): {rmse_by_backend[name]:.2f}")
+                if name == backend:
+                    model = forecaster
+            stages.mark('train')
+
+            # Прогнозирование будущих цен
+            logger.info("Прогнозирование будущих цен...")
+            raw_forecast = np.asarray(model.forecast(scaled_data, days_to_predict))
+        rmse = rmse_by_backend[backend]
 
         # Применяем коррекцию на основе новостной тональности
         sentiment_factor = 1 + (news_sentiment * 0.05)
-        future_predictions = [p * sentiment_factor for p in future_predictions]
+        future_predictions = [p * sentiment_factor for p in raw_forecast]
 
-        future_predictions = scaler.inverse_transform(
-            np.array(future_predictions).reshape(-1, 1)
+        future_predictions = inverse_target(
+            scaler, np.array(future_predictions).reshape(-1, 1), target_index
         )
 
         # Генерация дат для прогноза
-        last_date = df['Date'].iloc[-1]
-        future_dates = [last_date + timedelta(days=i) for i in range(1, days_to_predict + 1)]
-
-        # Визуализация результатов
-        plt.figure(figsize=(14, 6))
-        plt.plot(df['Date'], df['Close'], label='Исторические данные')
-        plt.plot(future_dates, future_predictions, 'ro-', label='Прогноз')
-        plt.title(f'Прогноз цен на {symbol}')
-        plt.xlabel('Дата')
-        plt.ylabel('Цена (USD)')
-        plt.legend()
-        plt.grid(True)
-
-        # Сохранение результатов
-        os.makedirs('results', exist_ok=True)
-        plot_path = os.path.join('results', f'{symbol}_forecast_{datetime.now().strftime("%Y%m%d%H%M")}.png')
-        plt.savefig(plot_path)
-        plt.close()
+        future_dates = [last_candle + timedelta(days=i) for i in range(1, days_to_predict + 1)]
+        stages.mark('predict')
+
+        # Визуализация результатов: график рисуется в пуле рендеринга,
+        # пока сохраняется CSV (matplotlib импортируется только здесь)
+        try:
+            from .rendering import chart_renderer
+        except ImportError:
+            from rendering import chart_renderer
+
+        plot_path = csv_path = chart_png = None
+        if save_results:
+            os.makedirs('results', exist_ok=True)
+            plot_path = os.path.join('results', f'{symbol}_forecast_{datetime.now().strftime("%Y%m%d%H%M")}.png')
+        plot_future = chart_renderer.submit_forecast(
+            symbol, df['Date'], df['Close'], future_dates, future_predictions, path=plot_path
+        )
 
         # Сохранение данных прогноза
-        forecast_df = pd.DataFrame({
-            'Date': future_dates,
-            'Forecast': future_predictions.flatten()
-        })
-        csv_path = os.path.join('results', f'{symbol}_forecast_{datetime.now().strftime("%Y%m%d%H%M")}.csv')
-        forecast_df.to_csv(csv_path, index=False)
+        if save_results:
+            forecast_df = pd.DataFrame({
+                'Date': future_dates,
+                'Forecast': future_predictions.flatten()
+            })
+            csv_path = os.path.join('results', f'{symbol}_forecast_{datetime.now().strftime("%Y%m%d%H%M")}.csv')
+            forecast_df.to_csv(csv_path, index=False)
+            plot_future.result()
+        else:
+            chart_png = plot_future.result()
+        stages.mark('plot')
 
         duration = time.time() - start_time
-        logger.info(f"Анализ завершен за {duration:.2f} сек. Результаты сохранены в {plot_path} и {csv_path}")
+        if save_results:
+            logger.info(f"Анализ завершен за {duration:.2f} сек. Результаты сохранены в {plot_path} и {csv_path}")
+        else:
+            logger.info(f"Анализ завершен за {duration:.2f} сек.")
 
-        return {
+        result = {
             'symbol': symbol,
             'historical_data': df,
             'forecast_dates': future_dates,
             'forecast_prices': future_predictions.flatten().tolist(),
             'rmse': rmse,
+            'backend': backend,
+            'rmse_by_backend': rmse_by_backend,
             'news_sentiment': news_sentiment,
             'plot_path': plot_path,
             'csv_path': csv_path,
+            'chart_png': chart_png,
             'processing_time': duration
         }
+        if not save_results:
+            # Версия модели берётся после обучения: оно могло обновить веса LSTM
+            forecast_cache.set(
+                forecast_cache.key(symbol, last_candle, model_version(config, symbol, backend, features, look_back),
+                                   days_to_predict),
+                {'result': result, 'scaler': scaler, 'target_index': target_index,
+                 'rmse_by_backend': rmse_by_backend, 'raw_forecast': raw_forecast}
+            )
+        return result
     except Exception as e:
         logger.exception(f"Ошибка в perform_full_analysis: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def build_report(result):
+    """Формирует текст отчёта (Markdown) для отправки в Telegram."""
+    prices = result['forecast_prices']
+    last_close = float(result['historical_data']['Close'].iloc[-1])
+    change = (prices[-1] / last_close - 1) * 100 if last_close else 0.0
+    lines = [
+        f"📈 **{result['symbol']} forecast** ({result['backend']})",
+        f"**Last close:** ${last_close:,.2f}",
+        f"**In {len(prices)} days:** ${prices[-1]:,.2f} ({change:+.2f}%)",
+        f"**Range:** ${min(prices):,.2f} – ${max(prices):,.2f}",
+        f"**News sentiment:** {result['news_sentiment']:.2f}",
+    ]
+    for name, value in result['rmse_by_backend'].items():
+        lines.append(f"**RMSE ({name}):** {value:.2f}")
+    return '\n'.join(lines)
\ No newline at end of file
@@ -1,14 +1,21 @@
 import os
-import requests
 import ccxt
 import pandas as pd
 from datetime import datetime, timedelta
-from .database import save_historical_data, log_error
+from .database import (save_historical_data, get_candles, get_last_candle_time, log_error,
+                       BASE_TIMEFRAME, ROLLUPS, TIMEFRAME_MS)
 from .utils import DataCache
+from .metrics import metrics, timed
+from .http_client import http_client
+from .ai_client import get_ai_client
+from .price_board import get_board
+from .price_aggregator import get_price_service
 
 # Cache setup
 price_cache = DataCache(ttl=60)
 chain_cache = DataCache(ttl=3600)
+metrics.register_cache('price', price_cache)
+metrics.register_cache('chain', chain_cache)
 
 # Blockchain explorers
 BLOCKCHAIN_APIS = {
@@ -45,9 +52,10 @@ BLOCKCHAIN_APIS = {
 }
 
 
+@timed('api.safe_api_request', none_is_error=True)
 def safe_api_request(url, params=None, headers=None, timeout=10):
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=timeout)
+        response = http_client.get(url, params=params, headers=headers, timeout=timeout)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -55,43 +63,89 @@ def safe_api_request(url, params=None, headers=None, timeout=10):
         return None
 
 
+@timed('api.get_crypto_price', none_is_error=True)
 def get_crypto_price(symbol):
-    cached = price_cache.get(symbol)
-    if cached:
-        return cached
+    # Prices published by the monitoring service's feeder cost no request in any process
+    board = get_board()
+    if board is not None:
+        price_data = board.read(symbol, max_age=price_cache.ttl)
+        if price_data:
+            return price_data
 
     try:
-        exchange = ccxt.binance()
-        ticker = exchange.fetch_ticker(symbol)
-        price_data = {
-            'price': ticker['last'],
-            'high': ticker['high'],
-            'low': ticker['low'],
-            'change': ticker['percentage'],
-            'volume': ticker['quoteVolume'],
-            'symbol': symbol
-        }
-        price_cache.set(symbol, price_data)
-        return price_data
+        # Consensus of several exchanges, cached in price_cache
+        return get_price_service(price_cache).get_price(symbol)
     except Exception as e:
         log_error("PRICE", f"Error: {e}")
         return None
 
 
+@timed('api.get_crypto_prices')
+def get_crypto_prices(symbols):
+    # get_crypto_price for many symbols: the ones not on the board cost one fan-out together
+    prices = {}
+    board = get_board()
+    if board is not None:
+        for symbol in symbols:
+            price_data = board.read(symbol, max_age=price_cache.ttl)
+            if price_data:
+                prices[symbol] = price_data
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        try:
+            prices.update(get_price_service(price_cache).get_prices(missing))
+        except Exception as e:
+            log_error("PRICE", f"Error: {e}")
+    return prices
+
+
+@timed('api.fetch_prices')
+def fetch_prices(symbols):
+    # Fresh composites for the price board feeder: one batched request per exchange
+    return get_price_service(price_cache).get_prices(symbols, use_cache=False)
+
+
+@timed('api.sync_candles')
+def sync_candles(symbol, days=90, exchange=None, limit=1000):
+    # Fetches only base candles newer than the last stored one; rollups follow in save_historical_data
+    exchange = exchange or ccxt.binance()
+    step = TIMEFRAME_MS[BASE_TIMEFRAME]
+    since = exchange.parse8601((datetime.utcnow() - timedelta(days=days)).isoformat())
+    last = get_last_candle_time(symbol)
+    if last is not None:
+        # The last stored candle may have been incomplete: fetch it again
+        since = max(since, last)
+    fetched = 0
+    while True:
+        ohlcv = exchange.fetch_ohlcv(symbol, BASE_TIMEFRAME, since, limit)
+        if not ohlcv:
+            break
+        save_historical_data(symbol, ohlcv)
+        fetched += len(ohlcv)
+        if len(ohlcv) < limit:
+            break
+        since = ohlcv[-1][0] + step
+    return fetched
+
+
+@timed('api.fetch_historical_data_from_exchange', none_is_error=True)
 def fetch_historical_data_from_exchange(symbol, timeframe='4h', days=90):
     exchange = ccxt.binance()
     since = exchange.parse8601((datetime.utcnow() - timedelta(days=days)).isoformat())
 
     try:
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since)
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        save_historical_data(symbol, ohlcv)
-        return df
+        if timeframe != BASE_TIMEFRAME and timeframe not in dict(ROLLUPS):
+            # Not derivable from the stored candles
+            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since)
+            return pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        sync_candles(symbol, days, exchange)
+        return get_candles(symbol, timeframe, since)
     except Exception as e:
         log_error("HIST_DATA", f"Error: {e}")
         return None
 
 
+@timed('api.get_whale_transactions')
 def get_whale_transactions(currency, min_value=500000):
     transactions = []
     for chain, config in BLOCKCHAIN_APIS.items():
@@ -124,34 +178,11 @@ def get_whale_transactions(currency, min_value=500000):
     return transactions
 
 
+@timed('api.get_ai_recommendation')
 def get_ai_recommendation(context):
-    headers = {
-        "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-        "Content-Type": "application/json"
-    }
+    return get_ai_client().recommend(context)
 
-    payload = {
-        "model": "deepseek-chat",
-        "messages": [
-            {"role": "system", "content": "You are a professional crypto trader. Provide detailed analysis."},
-            {"role": "user", "content": context}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 2000
-    }
 
-    try:
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        if 'choices' in result and result['choices']:
-            return result['choices'][0]['message']['content']
-        return "❌ Failed to get AI recommendation"
-    except Exception as e:
-        log_error("AI_API", f"Error: {e}")
-        return "❌ AI service unavailable"
\ No newline at end of file
+def stream_ai_recommendation(context):
+    # Chunks as they arrive, e.g. for delivery.send_streaming
+    return get_ai_client().stream(context)
@@ -1,8 +1,8 @@
 import os
-import requests
 import subprocess
 from .config import Config
 from .utils import log_error
+from .http_client import http_client
 
 config = Config()
 
@@ -28,7 +28,7 @@ class AutoCoder:
         }
 
         try:
-            response = requests.post(
+            response = http_client.post(
                 "https://api.deepseek.com/v1/chat/completions",
                 json=payload,
                 headers=headers,
@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import MinMaxScaler
+
+# backtest импортируется и из пакета, и как модуль верхнего уровня (CLI)
+try:
+    from .features import inverse_target
+    from .forecasters import get_forecaster, backend_settings
+except ImportError:
+    from features import inverse_target
+    from forecasters import get_forecaster, backend_settings
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+BACKTEST_CACHE_DIR = os.path.join('cache', 'backtest')
+
+
+def fold_origins(num_rows, look_back, min_train, test_size, step, n_folds=None):
+    """Точки начала тестовых окон.
+
+    Сетка привязана к началу ряда, поэтому с появлением новых свечей добавляются
+    только новые фолды, а ключи кэша уже посчитанных не меняются.
+    """
+    first = look_back + min_train
+    origins = list(range(first, num_rows - test_size + 1, step))
+    if n_folds:
+        origins = origins[-n_folds:]
+    return origins
+
+
+def _fold_key(values, origin, test_size, backend, look_back, model_config):
+    # Ключ зависит только от данных, которые видит фолд, и от настроек, которые читает бэкенд
+    digest = hashlib.sha1(np.ascontiguousarray(values[:origin + test_size]).tobytes())
+    digest.update(json.dumps([origin, test_size, backend, look_back, backend_settings(backend, model_config)],
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _run_fold(args):
+    """Обучает модель на [0, origin) и прогнозирует [origin, origin + test_size).
+
+    Масштабировщик обучается только на обучающей части фолда, чтобы не
+    заглядывать в будущее.
+    """
+    values, target_index, origin, test_size, backend, look_back, model_config = args
+    window = values[:origin + test_size]
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(window[:origin])
+    scaled = scaler.transform(window).astype(np.float32)
+
+    forecaster = get_forecaster(backend, 'backtest', target_index, look_back, model_config, persist=False)
+    forecaster.fit(scaled, origin)
+    predictions = inverse_target(scaler, forecaster.predict_range(scaled, origin, origin + test_size), target_index)
+    return np.asarray(predictions, dtype=np.float64).ravel()
+
+
+def compute_metrics(predictions, actuals, previous):
+    """Метрики по всем фолдам сразу; массивы формы (фолды, test_size)."""
+    errors = predictions - actuals
+    direction_hit = np.sign(predictions - previous) == np.sign(actuals - previous)
+    return pd.DataFrame({
+        'rmse': np.sqrt(np.mean(errors ** 2, axis=1)),
+        'mae': np.mean(np.abs(errors), axis=1),
+        'mape': np.mean(np.abs(errors) / np.abs(actuals), axis=1) * 100,
+        'directional_accuracy': np.mean(direction_hit, axis=1) * 100,
+    })
+
+
+class WalkForwardBacktester:
+    """Бэктест прогнозной модели на скользящих точках старта (walk-forward).
+
+    Фолды считаются параллельно в отдельных процессах, результаты каждого фолда
+    кэшируются на диске по хэшу данных и настроек модели.
+    """
+
+    def __init__(self, backend='ridge', look_back=60, test_size=30, step=30, min_train=365,
+                 n_folds=None, workers=None, model_config=None, cache_dir=BACKTEST_CACHE_DIR):
+        self.backend = backend
+        self.look_back = look_back
+        self.test_size = test_size
+        self.step = step
+        self.min_train = min_train
+        self.n_folds = n_folds
+        self.workers = workers or os.cpu_count() or 1
+        self.model_config = model_config or {}
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _load_fold(self, key):
+        try:
+            return np.load(self._cache_path(key))
+        except (OSError, ValueError):
+            return None
+
+    def _save_fold(self, key, predictions):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.save(self._cache_path(key), predictions)
+
+    def run(self, values, target_index):
+        """Запускает бэктест по матрице признаков (без масштабирования).
+
+        Возвращает DataFrame с метриками по фолдам.
+        """
+        values = np.asarray(values, dtype=np.float32)
+        origins = fold_origins(len(values), self.look_back, self.min_train, self.test_size,
+                               self.step, self.n_folds)
+        if not origins:
+            raise ValueError(f"Недостаточно данных для бэктеста: {len(values)} строк")
+
+        keys = [_fold_key(values, origin, self.test_size, self.backend, self.look_back, self.model_config)
+                for origin in origins]
+        results = {key: self._load_fold(key) for key in keys}
+        pending = [(origin, key) for origin, key in zip(origins, keys) if results[key] is None]
+        logger.info(f"Бэктест {self.backend}: {len(origins)} фолдов, из кэша {len(origins) - len(pending)}, "
+                    f"к расчёту {len(pending)}")
+
+        tasks = [(values, target_index, origin, self.test_size, self.backend, self.look_back, self.model_config)
+                 for origin, _ in pending]
+        if len(tasks) > 1 and self.workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as executor:
+                computed = list(executor.map(_run_fold, tasks))
+        else:
+            computed = [_run_fold(task) for task in tasks]
+
+        for (_, key), predictions in zip(pending, computed):
+            self._save_fold(key, predictions)
+            results[key] = predictions
+
+        # Все фолды сводятся в матрицы (фолды, test_size) для векторного расчёта метрик
+        target = values[:, target_index].astype(np.float64)
+        index = np.array(origins)[:, None] + np.arange(self.test_size)
+        predictions = np.vstack([results[key] for key in keys])
+        metrics = compute_metrics(predictions, target[index], target[index - 1])
+        metrics.insert(0, 'origin', origins)
+        return metrics
+
+
+def summarize(metrics):
+    """Средние метрики по всем фолдам."""
+    return metrics.drop(columns=['origin']).mean().to_dict()
@@ -0,0 +1,165 @@
+"""Локальная заглушка chat-completions API DeepSeek (с потоковой выдачей).
+
+    python benchmarks/deepseek_stub.py --port 8089     # затем deepseek_api_url = http://127.0.0.1:8089/v1/chat/completions
+    python benchmarks/deepseek_stub.py --demo          # кэш, лимит параллелизма и время до первого токена
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER = ("**BTC outlook:** momentum is neutral to bullish. Support near the 20-day SMA, "
+          "resistance at the recent high. Consider scaling in on pullbacks and keep a stop "
+          "below support. Volume confirms the trend; sentiment is mildly positive.")
+
+
+def start_stub(port=0, first_token_delay=0.5, token_delay=0.02):
+    """Запускает заглушку в фоновом потоке; server.url — адрес endpoint, server.requests — число запросов."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            with server.lock:
+                server.requests += 1
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            try:
+                time.sleep(first_token_delay)
+                tokens = [word + ' ' for word in ANSWER.split()]
+                if payload.get('stream'):
+                    self._stream(tokens)
+                else:
+                    self._respond(tokens)
+            except (BrokenPipeError, ConnectionResetError):
+                # Клиент закрыл соединение, не дочитав ответ
+                self.close_connection = True
+            finally:
+                with server.lock:
+                    server.active -= 1
+
+        def _respond(self, tokens):
+            time.sleep(token_delay * len(tokens))
+            body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': ''.join(tokens)}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, tokens):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token in tokens:
+                self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n")
+                time.sleep(token_delay)
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    # Клиент закрывает keep-alive соединения сбросом — это не ошибка заглушки
+    server.handle_error = lambda request, client_address: None
+    server.lock = threading.Lock()
+    server.requests = server.active = server.max_active = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    threading.Thread(target=server.serve_forever, name='deepseek-stub', daemon=True).start()
+    return server
+
+
+def demo(users=20, symbols=4, max_concurrency=2):
+    from benchmarks.suite import import_service
+
+    server = start_stub()
+    ai_client = import_service('ai_client')
+    client = ai_client.DeepSeekClient(api_url=server.url, api_key='stub', max_concurrency=max_concurrency)
+
+    def ask(user):
+        price = ai_client.format_price(50000 + user * 0.01)
+        context = f"Analyse {['BTC', 'ETH', 'SOL', 'XRP'][user % symbols]} at price {price}"
+        start = time.perf_counter()
+        first = None
+        for chunk in client.stream(context):
+            first = first or time.perf_counter() - start
+        return first, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        timings = list(executor.map(ask, range(users)))
+    total = time.perf_counter() - start
+
+    first_tokens = sorted(t[0] for t in timings)
+    print(f"{users} запросов ({symbols} разных контекстов) за {total:.2f} с")
+    print(f"Запросов к API: {server.requests}, одновременно не более {server.max_active}")
+    print(f"Первый токен: медиана {first_tokens[len(first_tokens) // 2]:.2f} с, мин {first_tokens[0]:.2f} с")
+    print(f"Попаданий в кэш: {client.hits}, промахов: {client.misses}")
+    server.shutdown()
+    return check_cache_keys(ai_client, client)
+
+
+def check_cache_keys(ai_client, client):
+    """Контексты, которые различаются не только шумом цены, должны иметь разные ключи кэша."""
+    price = ai_client.format_price
+    distinct = [
+        ("BTC outlook for 2024", "BTC outlook for 2025"),
+        ("hold 1001 BTC", "hold 1004 BTC"),
+        ("BTC at 67,450", "BTC at 68,450"),
+    ]
+    same = [
+        (f"Analyse BTC at price {price(50000.01)}", f"analyse  BTC at price {price(50000.19)}"),
+    ]
+    problems = [f"общий ключ кэша у '{a}' и '{b}'" for a, b in distinct if client.cache_key(a) == client.cache_key(b)]
+    problems += [f"разные ключи кэша у '{a}' и '{b}'" for a, b in same if client.cache_key(a) != client.cache_key(b)]
+    for problem in problems:
+        print(f"ОШИБКА: {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--first-token-delay', type=float, default=0.5)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--demo', action='store_true')
+    options = parser.parse_args()
+
+    if options.demo:
+        # База ответов создаётся в текущем каталоге — работаем во временном
+        workdir = tempfile.mkdtemp(prefix='cryptomaster-ai-')
+        os.chdir(workdir)
+        try:
+            problems = demo()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        sys.exit(1 if problems else 0)
+
+    server = start_stub(options.port, options.first_token_delay, options.token_delay)
+    print(f"Заглушка DeepSeek: {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
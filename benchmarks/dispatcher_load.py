@@ -0,0 +1,46 @@
+"""Нагрузочный тест NotificationDispatcher на FakeBot.
+
+    python benchmarks/dispatcher_load.py --chats 5000 --events 3
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatcher import NotificationDispatcher  # noqa: E402
+from benchmarks.fakes import FakeBot  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=3, help='Событий о китах на каждый чат')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=25, help='Глобальный лимит сообщений/с')
+    parser.add_argument('--latency', type=float, default=0.02)
+    options = parser.parse_args()
+
+    bot = FakeBot(latency=options.latency)
+    dispatcher = NotificationDispatcher(bot, workers=options.workers, global_rate=options.rate,
+                                        coalesce_window=0.5)
+    chats = list(range(options.chats))
+
+    start = time.perf_counter()
+    for event in range(options.events):
+        dispatcher.broadcast(chats, f"🐳 **WHALE ALERT!** event {event}", coalesce_key='whale')
+    enqueue_time = time.perf_counter() - start
+
+    dispatcher.join()
+    total_time = time.perf_counter() - start
+    dispatcher.stop()
+
+    print(f"Постановка в очередь: {enqueue_time * 1000:.1f} мс")
+    print(f"Доставлено {len(bot.messages)} сообщений за {total_time:.1f} с "
+          f"({len(bot.messages) / total_time:.1f} сообщ./с)")
+    print(f"Статистика: {dispatcher.stats}, ответов 429: {bot.flood_errors}")
+
+
+if __name__ == '__main__':
+    main()
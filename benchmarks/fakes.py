@@ -0,0 +1,227 @@
+"""Локальные заглушки внешних сервисов для нагрузочных тестов и бенчмарков."""
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# Биржи ccxt, которые подменяет offline() (см. Config['price_exchanges'])
+EXCHANGES = ('binance', 'okx', 'bybit', 'kraken', 'kucoin')
+
+
+class FakeTelegramError(Exception):
+    """Повторяет интерфейс telebot ApiTelegramException (error_code, result_json)."""
+
+    def __init__(self, error_code, description, retry_after=None):
+        super().__init__(description)
+        self.error_code = error_code
+        self.result_json = {'ok': False, 'error_code': error_code, 'description': description}
+        if retry_after is not None:
+            self.result_json['parameters'] = {'retry_after': retry_after}
+
+
+class FakeBot:
+    """Имитация telebot.TeleBot: задержка сети и лимиты Telegram (ответ 429)."""
+
+    def __init__(self, latency=0.02, global_limit=30, per_chat_limit=1, retry_after=1):
+        self.latency = latency
+        self.global_limit = global_limit
+        self.per_chat_limit = per_chat_limit
+        self.retry_after = retry_after
+        self.messages = []
+        self.photos = []
+        self.edits = []
+        self.flood_errors = 0
+        self._recent = collections.deque()
+        self._recent_by_chat = collections.defaultdict(collections.deque)
+        self._file_ids = 0
+        self._lock = threading.Lock()
+
+    def _check_limits(self, chat_id):
+        with self._lock:
+            now = time.monotonic()
+            for recent in (self._recent, self._recent_by_chat[chat_id]):
+                while recent and now - recent[0] > 1.0:
+                    recent.popleft()
+            if (len(self._recent) >= self.global_limit
+                    or len(self._recent_by_chat[chat_id]) >= self.per_chat_limit):
+                self.flood_errors += 1
+                raise FakeTelegramError(429, 'Too Many Requests', self.retry_after)
+            self._recent.append(now)
+            self._recent_by_chat[chat_id].append(now)
+
+    def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        self._check_limits(chat_id)
+        time.sleep(self.latency)
+        with self._lock:
+            self.messages.append((chat_id, text))
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=len(self.messages), text=text)
+
+    def edit_message_text(self, text, chat_id, message_id, parse_mode=None, **kwargs):
+        self._check_limits(chat_id)
+        time.sleep(self.latency)
+        with self._lock:
+            self.edits.append((chat_id, message_id, text))
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=message_id, text=text)
+
+    def send_photo(self, chat_id, photo, caption=None, parse_mode=None, **kwargs):
+        self._check_limits(chat_id)
+        time.sleep(self.latency)
+        with self._lock:
+            if isinstance(photo, str):
+                file_id = photo
+            else:
+                self._file_ids += 1
+                file_id = f"fake-file-{self._file_ids}"
+            self.photos.append((chat_id, file_id))
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)], caption=caption)
+
+
+class FakeResponse:
+    """Минимальный requests.Response поверх записанной фикстуры."""
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} (фикстура)", response=self)
+
+
+class _AnyMarkets(dict):
+    def __contains__(self, symbol):
+        return True
+
+    def __missing__(self, symbol):
+        return {}
+
+
+class FakeExchange:
+    """Имитация биржи ccxt на записанных свечах и тикере."""
+
+    has = {'fetchTickers': True}
+
+    def __init__(self, fixtures, latency=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.calls = collections.Counter()
+
+    def parse8601(self, value):
+        return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def load_markets(self):
+        return self.markets
+
+    @property
+    def markets(self):
+        # Любой символ считается торгуемым
+        return _AnyMarkets()
+
+    def fetch_ticker(self, symbol):
+        self.calls['fetch_ticker'] += 1
+        time.sleep(self.latency)
+        return dict(self.fixtures.json('binance_ticker.json'), symbol=symbol, timestamp=self.milliseconds())
+
+    def fetch_tickers(self, symbols=None):
+        self.calls['fetch_tickers'] += 1
+        time.sleep(self.latency)
+        return {symbol: dict(self.fixtures.json('binance_ticker.json'), symbol=symbol, timestamp=self.milliseconds())
+                for symbol in symbols or []}
+
+    def fetch_ohlcv(self, symbol, timeframe='4h', since=None, limit=None):
+        self.calls['fetch_ohlcv'] += 1
+        time.sleep(self.latency)
+        return [list(row) for row in self.fixtures.json('binance_ohlcv.json')[:limit]]
+
+
+class Fixtures:
+    """Записанные ответы внешних API (см. benchmarks/record_fixtures.py)."""
+
+    # Фрагмент URL -> файл фикстуры
+    ROUTES = {
+        'finance.yahoo.com': 'yahoo_chart.json',
+        'news.google.com': 'google_news.xml',
+        'bing.com/news': 'bing_news.xml',
+        'etherscan.io': 'etherscan_tokentx.json',
+        'bscscan.com': 'etherscan_tokentx.json',
+        'polygonscan.com': 'etherscan_tokentx.json',
+        'arbiscan.io': 'etherscan_tokentx.json',
+        'snowtrace.io': 'etherscan_tokentx.json',
+    }
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = directory
+        self._raw = {}
+        self._json = {}
+
+    def override(self, name, content):
+        """Подменяет содержимое фикстуры (None — вернуть записанное)."""
+        self._raw.pop(name, None)
+        self._json.pop(name, None)
+        if content is not None:
+            self._raw[name] = content
+
+    def raw(self, name):
+        if name not in self._raw:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                self._raw[name] = f.read()
+        return self._raw[name]
+
+    def json(self, name):
+        if name not in self._json:
+            self._json[name] = json.loads(self.raw(name))
+        return self._json[name]
+
+    def response(self, url):
+        for fragment, name in self.ROUTES.items():
+            if fragment in url:
+                return FakeResponse(self.raw(name))
+        return FakeResponse(b'{}', status_code=404)
+
+
+@contextlib.contextmanager
+def offline(fixtures=None, latency=0.0):
+    """Подменяет сетевые вызовы (requests, биржи ccxt) ответами из фикстур."""
+    import ccxt
+
+    fixtures = fixtures or Fixtures()
+    exchange = FakeExchange(fixtures, latency)
+
+    def fake_request(session, method, url, *args, **kwargs):
+        time.sleep(latency)
+        return fixtures.response(url)
+
+    def fake_get(url, *args, **kwargs):
+        return fake_request(None, 'GET', url)
+
+    # Session.request covers http_client and any other session; requests.get — direct calls
+    patches = [(requests, 'get', fake_get), (requests.Session, 'request', fake_request),
+               *((ccxt, exchange_id, lambda *args, **kwargs: exchange) for exchange_id in EXCHANGES)]
+    originals = [(target, name, getattr(target, name)) for target, name, _ in patches]
+    for target, name, replacement in patches:
+        setattr(target, name, replacement)
+    try:
+        yield exchange
+    finally:
+        for target, name, original in originals:
+            setattr(target, name, original)
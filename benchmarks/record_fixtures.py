@@ -0,0 +1,136 @@
+"""Запись фикстур внешних API для офлайн-бенчмарков.
+
+С --live ответы Yahoo Finance, Binance, Etherscan и новостных RSS-лент
+записываются как есть (нужны сеть и ETHERSCAN_API_KEY). Без --live
+генерируются детерминированные данные того же формата (случайное
+блуждание с фиксированным seed) — их достаточно для замеров скорости.
+
+    python benchmarks/record_fixtures.py --live
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+
+SYMBOL = 'BTC-USD'
+PAIR = 'BTC/USDT'
+YAHOO_DAYS = 1500
+BINANCE_CANDLES = 1000
+NEWS_ITEMS = 20
+# Фиксированный конец истории, чтобы синтетические фикстуры не зависели от даты запуска
+SYNTHETIC_END = 1735689600  # 2025-01-01
+
+
+def _write(name, content):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, name)
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode) as f:
+        if isinstance(content, (dict, list)):
+            json.dump(content, f)
+        else:
+            f.write(content)
+    print(f"Записано: {path}")
+
+
+def _random_walk(rng, n, start):
+    returns = rng.normal(0.0005, 0.03, n)
+    close = start * np.exp(np.cumsum(returns))
+    spread = np.abs(rng.normal(0, 0.015, n)) * close
+    open_ = np.concatenate([[start], close[:-1]])
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(23, 0.4, n)
+    return [np.round(a, 2) for a in (open_, high, low, close, volume)]
+
+
+def _rss(source, titles):
+    items = ''.join(f"<item><title>{title}</title><link>https://example.com/{source}/{i}</link></item>"
+                    for i, title in enumerate(titles))
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{source}</title>{items}</channel></rss>'
+
+
+def generate_synthetic(seed=42):
+    rng = np.random.default_rng(seed)
+    now = SYNTHETIC_END
+
+    open_, high, low, close, volume = _random_walk(rng, YAHOO_DAYS, 20000.0)
+    _write('yahoo_chart.json', {'chart': {'result': [{
+        'meta': {'symbol': SYMBOL, 'currency': 'USD'},
+        'timestamp': [now - (YAHOO_DAYS - i) * 86400 for i in range(YAHOO_DAYS)],
+        'indicators': {'quote': [{'open': open_.tolist(), 'high': high.tolist(), 'low': low.tolist(),
+                                  'close': close.tolist(), 'volume': volume.tolist()}]},
+    }], 'error': None}})
+
+    open_, high, low, close, volume = _random_walk(rng, BINANCE_CANDLES, 60000.0)
+    start_ms = (now - BINANCE_CANDLES * 4 * 3600) * 1000
+    _write('binance_ohlcv.json', [[start_ms + i * 4 * 3600 * 1000, open_[i], high[i], low[i], close[i], volume[i]]
+                                  for i in range(BINANCE_CANDLES)])
+    _write('binance_ticker.json', {'symbol': PAIR, 'last': close[-1], 'high': float(high[-6:].max()),
+                                   'low': float(low[-6:].min()), 'percentage': 1.23,
+                                   'quoteVolume': float(volume[-6:].sum())})
+
+    _write('etherscan_tokentx.json', {'status': '1', 'message': 'OK', 'result': [{
+        'hash': f"0x{rng.integers(0, 2 ** 63):016x}{i:048x}",
+        'from': f"0x{rng.integers(0, 2 ** 63):040x}",
+        'to': f"0x{rng.integers(0, 2 ** 63):040x}",
+        'value': str(int(rng.uniform(6e5, 5e7))),
+        'valueUSD': str(round(rng.uniform(6e5, 5e7), 2)),
+        'tokenSymbol': 'USDT',
+        'timeStamp': str(now - i * 600),
+    } for i in range(5)]})
+
+    words = ['Bitcoin', 'rallies', 'slumps', 'as', 'ETF', 'inflows', 'grow', 'regulators', 'warn',
+             'miners', 'record', 'high', 'fear', 'market', 'traders', 'bullish', 'crash', 'steady']
+    for source in ('google_news', 'bing_news'):
+        titles = [' '.join(rng.choice(words, 8)) for _ in range(NEWS_ITEMS)]
+        _write(f"{source}.xml", _rss(source, titles))
+
+
+def record_live():
+    import requests
+    import ccxt
+
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    from news import NEWS_SOURCES
+
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    end = int(time.time())
+    url = (f"https://query1.finance.yahoo.com/v8/finance/chart/{SYMBOL}"
+           f"?period1={end - YAHOO_DAYS * 86400}&period2={end}&interval=1d")
+    _write('yahoo_chart.json', requests.get(url, headers=headers, timeout=30).json())
+
+    exchange = ccxt.binance()
+    since = exchange.milliseconds() - BINANCE_CANDLES * 4 * 3600 * 1000
+    _write('binance_ohlcv.json', exchange.fetch_ohlcv(PAIR, '4h', since, limit=BINANCE_CANDLES))
+    ticker = exchange.fetch_ticker(PAIR)
+    _write('binance_ticker.json', {key: ticker[key] for key in
+                                   ('symbol', 'last', 'high', 'low', 'percentage', 'quoteVolume')})
+
+    params = {'module': 'account', 'action': 'tokentx', 'sort': 'desc', 'page': 1, 'offset': 5,
+              'contractaddress': '0xdac17f958d2ee523a2206206994597c13d831ec7',
+              'apikey': os.environ['ETHERSCAN_API_KEY']}
+    _write('etherscan_tokentx.json', requests.get('https://api.etherscan.io/api', params=params, timeout=30).json())
+
+    for source, template in NEWS_SOURCES.items():
+        _write(f"{source}.xml", requests.get(template.format('Bitcoin'), headers=headers, timeout=30).content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--live', action='store_true', help='Записать реальные ответы API')
+    parser.add_argument('--seed', type=int, default=42)
+    options = parser.parse_args()
+    if options.live:
+        record_live()
+    else:
+        generate_synthetic(options.seed)
+
+
+if __name__ == '__main__':
+    main()
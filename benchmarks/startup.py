@@ -0,0 +1,116 @@
+"""Бенчмарк времени запуска CLI на основе python -X importtime.
+
+Запускает main.py с --help для группы и каждой команды, суммирует время
+импорта и проверяет, что тяжёлые зависимости не загружаются при старте.
+При превышении бюджета из startup_budget.json завершается с кодом 1.
+
+    python benchmarks/startup.py            # проверка
+    python benchmarks/startup.py --update   # пересчитать бюджет
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BUDGET_PATH = os.path.join(BENCH_DIR, 'startup_budget.json')
+
+COMMANDS = [
+    ['--help'],
+    ['analyze', '--help'],
+    ['backtest', '--help'],
+    ['migrate-db', '--help'],
+    ['portfolio', '--help'],
+    ['profile', '--help'],
+    ['sentiment', '--help'],
+    ['stats', '--help'],
+    ['update-data', '--help'],
+]
+
+# Модули, которые не должны импортироваться при запуске CLI
+HEAVY_MODULES = ['tensorflow', 'keras', 'matplotlib', 'sklearn', 'scipy', 'pandas',
+                 'numpy', 'bs4', 'textblob', 'nltk', 'ccxt', 'telebot']
+
+# Запас к измеренным значениям при обновлении бюджета
+BUDGET_MARGIN = 1.5
+
+
+def parse_importtime(stderr):
+    """Возвращает (суммарное время импорта в мс, множество корневых пакетов)."""
+    total_us = 0
+    packages = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        packages.add(name.strip().split('.')[0])
+        # Импорты верхнего уровня записаны без отступа
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def measure(args, runs=3):
+    """Лучшее из runs время запуска и импорта для команды."""
+    best_wall = best_import = float('inf')
+    packages = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', 'main.py', *args],
+                                cwd=ROOT_DIR, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"main.py {' '.join(args)} завершился с кодом {result.returncode}")
+        import_ms, packages = parse_importtime(result.stderr)
+        best_wall = min(best_wall, wall_ms)
+        best_import = min(best_import, import_ms)
+    return {'wall_ms': best_wall, 'import_ms': best_import,
+            'heavy': sorted(packages & set(HEAVY_MODULES))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--update', action='store_true', help='Записать новый бюджет по текущим замерам')
+    parser.add_argument('--runs', type=int, default=3)
+    options = parser.parse_args()
+
+    results = {' '.join(args): measure(args, options.runs) for args in COMMANDS}
+    for name, result in results.items():
+        heavy = ', '.join(result['heavy']) or '-'
+        print(f"{name:<24} запуск {result['wall_ms']:8.1f} мс | импорт {result['import_ms']:8.1f} мс | "
+              f"тяжёлые модули: {heavy}")
+
+    if options.update:
+        budget = {
+            'max_wall_ms': round(max(r['wall_ms'] for r in results.values()) * BUDGET_MARGIN),
+            'max_import_ms': round(max(r['import_ms'] for r in results.values()) * BUDGET_MARGIN),
+            'forbidden_modules': HEAVY_MODULES,
+        }
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump(budget, f, indent=4)
+        print(f"Бюджет обновлён: {BUDGET_PATH}")
+        return 0
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    failures = []
+    for name, result in results.items():
+        if result['import_ms'] > budget['max_import_ms']:
+            failures.append(f"{name}: импорт {result['import_ms']:.1f} мс > {budget['max_import_ms']} мс")
+        if result['wall_ms'] > budget['max_wall_ms']:
+            failures.append(f"{name}: запуск {result['wall_ms']:.1f} мс > {budget['max_wall_ms']} мс")
+        forbidden = set(result['heavy']) & set(budget['forbidden_modules'])
+        if forbidden:
+            failures.append(f"{name}: при запуске импортируются {', '.join(sorted(forbidden))}")
+
+    for failure in failures:
+        print(f"РЕГРЕССИЯ: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
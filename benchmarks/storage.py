@@ -0,0 +1,132 @@
+"""Размер базы и скорость выборки свечей: старая схема historical_data против candles.
+
+Строит базу в прежнем формате (символ текстом в каждой строке, метки в
+миллисекундах, дублирующий индекс idx_symbol_time, отдельные таблицы
+свёрток), переводит её копию через database.migrate_storage и сравнивает.
+
+    python benchmarks/storage.py                    # 20 символов x 180 дней 15-минутных свечей
+    python benchmarks/storage.py --symbols 5 --days 30
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import statistics
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STEP_MS = 900000
+ROLLUP_MS = {'1h': 3600000, '4h': 14400000, '1d': 86400000}
+
+
+def build_legacy(path, symbols, days):
+    """База в схеме до перехода на candles, с теми же свёртками."""
+    conn = sqlite3.connect(path)
+    columns = "symbol TEXT, timestamp INTEGER, open REAL, high REAL, low REAL, close REAL, volume REAL"
+    conn.execute(f"CREATE TABLE historical_data ({columns}, PRIMARY KEY (symbol, timestamp))")
+    conn.execute("CREATE INDEX idx_symbol_time ON historical_data (symbol, timestamp)")
+    for timeframe in ROLLUP_MS:
+        conn.execute(f"CREATE TABLE ohlcv_{timeframe} ({columns}, PRIMARY KEY (symbol, timestamp))")
+
+    end = int(time.time() * 1000) // ROLLUP_MS['1d'] * ROLLUP_MS['1d']
+    start = end - days * ROLLUP_MS['1d']
+    rng = random.Random(42)
+    for symbol in symbols:
+        price = rng.uniform(1, 50000)
+        rows = []
+        for timestamp in range(start, end, STEP_MS):
+            close = price * (1 + rng.gauss(0, 0.002))
+            rows.append((symbol, timestamp, price, max(price, close) * 1.001, min(price, close) * 0.999,
+                         close, rng.uniform(1, 1000)))
+            price = close
+        conn.executemany("INSERT INTO historical_data VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        for timeframe, size in ROLLUP_MS.items():
+            conn.execute(f'''INSERT INTO ohlcv_{timeframe}
+                             SELECT symbol, timestamp / {size} * {size}, open, MAX(high), MIN(low), close, SUM(volume)
+                             FROM historical_data WHERE symbol = ? GROUP BY timestamp / {size}''', (symbol,))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return start, end
+
+
+def timed_runs(func, rounds=20):
+    func()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def legacy_query(conn, table, symbol, since, until):
+    return conn.execute(f'''SELECT timestamp, open, high, low, close, volume FROM {table}
+                            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+                            ORDER BY timestamp ASC''', (symbol, since, until)).fetchall()
+
+
+def compact_query(conn, timeframe, symbol, since, until):
+    # Тот же запрос, что в database.get_candles, без pandas
+    return conn.execute('''SELECT timestamp * 1000, open, high, low, close, volume FROM candles
+                           WHERE symbol_id = (SELECT id FROM symbols WHERE symbol = ?)
+                             AND timeframe = ? AND timestamp BETWEEN ? AND ?
+                           ORDER BY timestamp ASC''', (symbol, timeframe, since // 1000, until // 1000)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--days', type=int, default=180)
+    options = parser.parse_args()
+
+    symbols = [f"S{i:02d}/USDT" for i in range(options.symbols)]
+    # database работает с crypto_data.db в текущем каталоге
+    workdir = tempfile.mkdtemp(prefix='cryptomaster-storage-')
+    os.chdir(workdir)
+    try:
+        start, end = build_legacy('legacy.db', symbols, options.days)
+        shutil.copy('legacy.db', 'crypto_data.db')
+
+        from benchmarks.suite import import_service
+
+        database = import_service('database')
+        started = time.perf_counter()
+        before, after = database.migrate_storage('crypto_data.db')
+        migration_s = time.perf_counter() - started
+        database.init_db()
+
+        rows = options.symbols * options.days * 96
+        print(f"{options.symbols} символов x {options.days} дней = {rows} свечей 15m (+ свёртки 1h/4h/1d)")
+        print(f"Размер: {before / 1024 / 1024:.1f} МБ -> {after / 1024 / 1024:.1f} МБ "
+              f"(x{before / after:.2f}), миграция {migration_s:.1f} с")
+
+        migrated = sqlite3.connect('crypto_data.db').execute("SELECT COUNT(*) FROM candles").fetchone()[0]
+        print(f"Строк в candles после миграции: {migrated}")
+
+        legacy, compact = sqlite3.connect('legacy.db'), sqlite3.connect('crypto_data.db')
+        symbol = symbols[len(symbols) // 2]
+        queries = [
+            ('15m, 7 дней', 'historical_data', 15, end - 7 * ROLLUP_MS['1d']),
+            ('15m, весь период', 'historical_data', 15, start),
+            ('4h, весь период', 'ohlcv_4h', 240, start),
+            ('1d, весь период', 'ohlcv_1d', 1440, start),
+        ]
+        print(f"{'Выборка':<20} {'было, мс':>10} {'стало, мс':>10}")
+        for name, table, timeframe, since in queries:
+            legacy_ms = timed_runs(lambda: legacy_query(legacy, table, symbol, since, end))
+            compact_ms = timed_runs(lambda: compact_query(compact, timeframe, symbol, since, end))
+            print(f"{name:<20} {legacy_ms:>10.2f} {compact_ms:>10.2f}")
+        legacy.close()
+        compact.close()
+    finally:
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""Бенчмарки горячих путей на записанных фикстурах, без сети.
+
+Замеряются подготовка данных, обучение и прогноз LSTM, запись и чтение
+истории в SQLite, загрузка истории с Yahoo, проверка алертов и полный
+цикл мониторинга (алерты, киты, почасовой анализ) с FakeBot и FakeExchange.
+Результаты сохраняются в benchmarks/results/<метка>.json и сравниваются
+с предыдущим прогоном: замедление больше порога считается регрессией
+(код возврата 1). После цикла мониторинга проверяется, что тайминги
+и кэши анализа отдаются эндпоинтом /stats сервиса.
+
+    python benchmarks/suite.py                      # все бенчмарки, метка — коммит
+    python benchmarks/suite.py --quick -k alerts    # малые размеры, фильтр по имени
+    python benchmarks/suite.py --compare v0.1       # сравнить с сохранённой меткой
+"""
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import sqlite3
+import logging
+import argparse
+import platform
+import importlib
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+sys.path.insert(0, ROOT_DIR)
+
+# Модули импортируются как пакет: у сервиса и анализа общие Config и реестр метрик
+PACKAGE = 'cryptomaster'
+
+# Допустимое замедление относительно базового прогона
+REGRESSION_THRESHOLD = 0.25
+
+SIZES = {
+    'prepare_data': (500, 2000, 8000),
+    'lstm': (500, 2000),
+    'history_rows': (1000, 10000, 50000),
+    'yahoo_days': (365, 1500),
+    'alerts': (1000, 100000),
+}
+QUICK_SIZES = {
+    'prepare_data': (500,),
+    'lstm': (500,),
+    'history_rows': (1000,),
+    'yahoo_days': (365,),
+    'alerts': (1000,),
+}
+
+
+def import_service(name):
+    """Импортирует модуль сервиса как часть пакета, чтобы работали относительные импорты."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+class Case:
+    def __init__(self, name, func, setup=None, rounds=5):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.rounds = rounds
+
+    def run(self):
+        """Один прогрев и rounds замеров; setup выполняется перед каждым и не замеряется."""
+        timings = []
+        for i in range(self.rounds + 1):
+            if self.setup:
+                self.setup()
+            start = time.perf_counter()
+            self.func()
+            elapsed = time.perf_counter() - start
+            if i:
+                timings.append(elapsed * 1000)
+        return {
+            'min_ms': min(timings),
+            'median_ms': statistics.median(timings),
+            'mean_ms': statistics.fmean(timings),
+            'rounds': self.rounds,
+        }
+
+
+def _history_frame(fixtures, days):
+    import pandas as pd
+
+    quote = fixtures.json('yahoo_chart.json')['chart']['result'][0]['indicators']['quote'][0]
+    frame = pd.DataFrame({key.capitalize(): quote[key] for key in ('open', 'high', 'low', 'close', 'volume')})
+    repeats = -(-days // len(frame))
+    return pd.concat([frame] * repeats, ignore_index=True).iloc[:days]
+
+
+def _ohlcv_rows(fixtures, count, step):
+    """Свечи из фикстуры с шагом step мс, растянутые до count штук и сдвинутые к текущему времени."""
+    rows = fixtures.json('binance_ohlcv.json')
+    start = int(time.time() * 1000) - count * step
+    return [[start + i * step] + rows[i % len(rows)][1:] for i in range(count)]
+
+
+def _yahoo_fixture(fixtures, days):
+    chart = json.loads(fixtures.raw('yahoo_chart.json'))
+    result = chart['chart']['result'][0]
+    result['timestamp'] = result['timestamp'][-days:]
+    quote = result['indicators']['quote'][0]
+    for key in quote:
+        quote[key] = quote[key][-days:]
+    return json.dumps(chart).encode()
+
+
+def prepare_data_cases(fixtures, sizes):
+    prepare_data = import_service('analysis').prepare_data
+
+    for days in sizes:
+        frame = _history_frame(fixtures, days)
+        for features in (['Close'], ['Open', 'High', 'Low', 'Close', 'Volume']):
+            yield Case(f"analysis.prepare_data[{days}x{len(features)}]",
+                       lambda frame=frame, features=features: prepare_data(frame, 60, features))
+
+
+def lstm_cases(fixtures, sizes, epochs=2):
+    # TensorFlow импортируется только если бенчмарки LSTM не отфильтрованы
+    for days in sizes:
+        state = {}
+
+        def build(state=state, days=days):
+            analysis = import_service('analysis')
+            training = import_service('training')
+
+            if 'dataset' not in state:
+                frame = _history_frame(fixtures, days)
+                _, _, scaler = analysis.prepare_data(frame, 60, ['Close'])
+                scaled = scaler.transform(frame[['Close']].to_numpy()).astype('float32')
+                state['dataset'] = training.make_window_dataset(scaled, 60, 0, 60, days, batch_size=32)
+            state['model'] = analysis.build_lstm_model((60, 1))
+
+        def train(state=state):
+            state['model'].fit(state['dataset'], epochs=epochs, verbose=0)
+
+        def predict(state=state):
+            state['model'].predict(state['dataset'], verbose=0)
+
+        yield Case(f"lstm.train[{days}x{epochs}ep]", train, setup=build, rounds=3)
+        # Прогноз выполняется моделью, обученной в предыдущем бенчмарке
+        yield Case(f"lstm.predict[{days}]", predict,
+                   setup=lambda state=state, build=build: 'model' in state or build())
+
+
+def database_cases(fixtures, sizes):
+    database = import_service('database')
+    # Сохраняются свечи базового таймфрейма, из которых строятся свёртки 1h/4h/1d
+    step = database.TIMEFRAME_MS[database.BASE_TIMEFRAME]
+
+    for count in sizes:
+        rows = _ohlcv_rows(fixtures, count, step)
+        days = count * step // 86400000 + 1
+        yield Case(f"db.save_historical_data[{count}]",
+                   lambda rows=rows: database.save_historical_data('BENCH/USDT', rows), rounds=3)
+        yield Case(f"db.fetch_historical_data[{count}]",
+                   lambda days=days: database.fetch_historical_data('BENCH/USDT', days))
+        # Свёртка из таблицы ohlcv_1d вместо ресемплинга исходных свечей
+        yield Case(f"db.get_candles[1d,{count}]",
+                   lambda: database.get_candles('BENCH/USDT', '1d'))
+
+
+def yahoo_cases(fixtures, sizes):
+    fetch_historical_data = import_service('analysis').fetch_historical_data
+
+    for days in sizes:
+        content = _yahoo_fixture(fixtures, days)
+
+        def setup(content=content):
+            fixtures.override('yahoo_chart.json', content)
+
+        yield Case(f"analysis.fetch_historical_data[{days}]",
+                   lambda: fetch_historical_data('BTC-USD'), setup=setup)
+
+
+def _fill_alerts(count, currencies):
+    conn = sqlite3.connect('crypto_data.db')
+    conn.execute("DELETE FROM user_alerts")
+    conn.executemany(
+        "INSERT INTO user_alerts (user_id, currency, condition_type, threshold, is_active) VALUES (?, ?, ?, ?, 1)",
+        ((i // len(currencies), currencies[i % len(currencies)], 'price_above', 50000 + i) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def _clear_caches(api):
+    api.price_cache.cache.clear()
+    api.chain_cache.cache.clear()
+
+
+def monitoring_cases(fixtures, sizes, bot):
+    monitoring = import_service('monitoring')
+    api = import_service('api')
+    service = monitoring.MonitoringService(bot)
+    currencies = [f"C{i:02d}/USDT" for i in range(50)]
+
+    for count in sizes:
+        yield Case(f"monitoring.check_alerts[{count}]", service._check_alerts,
+                   setup=lambda count=count: (_fill_alerts(count, currencies), _clear_caches(api)),
+                   rounds=3)
+
+    def tick():
+        service._check_alerts()
+        service._detect_whale_activity()
+        service._hourly_analysis()
+
+    def setup():
+        _fill_alerts(sizes[0], currencies)
+        _clear_caches(api)
+        fixtures.override('yahoo_chart.json', None)
+
+    yield Case("monitoring.tick", tick, setup=setup, rounds=3)
+
+    def cold_setup():
+        setup()
+        import_service('forecast_cache').forecast_cache.invalidate()
+
+    # Без кэша прогнозов: полный конвейер анализа на каждом цикле
+    yield Case("monitoring.tick[cold]", tick, setup=cold_setup, rounds=3)
+
+
+def configure_service():
+    """Подписчики и отслеживаемые валюты для цикла мониторинга (config.json — во временном каталоге)."""
+    import_service('config').Config().update({
+        'subscribers': list(range(1000, 1100)),
+        'monitored_currencies': {str(chat_id): ['BTC-USD'] for chat_id in range(1000, 1020)},
+        'forecast_backend': 'ridge',
+    })
+    # Запросы к обозревателям блокчейнов выполняются только при наличии ключа
+    os.environ.setdefault('ETHERSCAN_API_KEY', 'bench')
+
+
+def check_served_stats():
+    """Тайминги и кэши анализа из цикла мониторинга должны быть в /stats сервиса.
+
+    Возвращает список проблем; пустой, если всё на месте.
+    """
+    import urllib.request
+
+    server = import_service('metrics').metrics.start_http_server(0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/stats", timeout=5) as response:
+        stats = json.loads(response.read())
+    problems = []
+    if not any(op.startswith('analysis.') for op in stats['operations']):
+        problems.append("в /stats сервиса нет таймингов analysis.*")
+    for cache in ('forecast', 'news_query', 'news_headline'):
+        if cache not in stats['caches']:
+            problems.append(f"в /stats сервиса нет кэша {cache}")
+    return problems
+
+
+def collect_cases(fixtures, sizes, bot):
+    yield from prepare_data_cases(fixtures, sizes['prepare_data'])
+    yield from database_cases(fixtures, sizes['history_rows'])
+    yield from yahoo_cases(fixtures, sizes['yahoo_days'])
+    yield from monitoring_cases(fixtures, sizes['alerts'], bot)
+    yield from lstm_cases(fixtures, sizes['lstm'])
+
+
+def git_label():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return time.strftime('%Y%m%d-%H%M%S')
+
+
+def git_history():
+    """Полные хэши коммитов от HEAD к началу истории (пусто без git)."""
+    try:
+        return subprocess.run(['git', 'log', '--format=%H'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.split()
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+
+def latest_results(exclude):
+    """Последний сохранённый прогон, кроме exclude.
+
+    Порядок берётся из истории git: после checkout или clone у всех файлов
+    одно время изменения. Прогоны с меткой не из истории (время вместо
+    коммита) сравниваются по полю created.
+    """
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    paths = {name[:-len('.json')]: os.path.join(RESULTS_DIR, name) for name in os.listdir(RESULTS_DIR)
+             if name.endswith('.json') and name != f"{exclude}.json"}
+    if not paths:
+        return None
+    for commit in git_history():
+        for label, path in paths.items():
+            if commit.startswith(label):
+                return path
+
+    def created(path):
+        with open(path) as f:
+            return json.load(f).get('created', '')
+    return max(paths.values(), key=created)
+
+
+def compare(results, baseline_path, threshold):
+    """Печатает сравнение с базовым прогоном и возвращает список регрессий."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nСравнение с {baseline['label']} ({baseline['created']}):")
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        ratio = result['median_ms'] / base['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <- РЕГРЕССИЯ'
+            regressions.append(f"{name}: {base['median_ms']:.1f} -> {result['median_ms']:.1f} мс (x{ratio:.2f})")
+        print(f"{name:<48} {base['median_ms']:10.1f} -> {result['median_ms']:10.1f} мс  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', '--filter', default='', help='Запускать только бенчмарки, содержащие подстроку')
+    parser.add_argument('--quick', action='store_true', help='Только малые размеры')
+    parser.add_argument('--label', default=None, help='Метка прогона (по умолчанию — текущий коммит)')
+    parser.add_argument('--compare', default=None, help='Метка базового прогона (по умолчанию — последний)')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--no-save', action='store_true', help='Не сохранять результаты')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    label = options.label or git_label()
+    sizes = QUICK_SIZES if options.quick else SIZES
+
+    # База, конфиг и кэши моделей создаются в текущем каталоге — работаем во временном
+    workdir = tempfile.mkdtemp(prefix='cryptomaster-bench-')
+    os.chdir(workdir)
+    from benchmarks.fakes import FakeBot, Fixtures, offline
+
+    fixtures = Fixtures()
+    bot = FakeBot(latency=0, global_limit=10 ** 9, per_chat_limit=10 ** 9)
+    results = {}
+    problems = []
+    try:
+        with offline(fixtures):
+            configure_service()
+            for case in collect_cases(fixtures, sizes, bot):
+                if options.filter not in case.name:
+                    continue
+                results[case.name] = case.run()
+                print(f"{case.name:<48} медиана {results[case.name]['median_ms']:10.1f} мс | "
+                      f"мин {results[case.name]['min_ms']:10.1f} мс")
+            if any(name.startswith('monitoring.tick') for name in results):
+                problems = check_served_stats()
+    finally:
+        os.chdir(ROOT_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline_path = (os.path.join(RESULTS_DIR, f"{options.compare}.json") if options.compare
+                     else latest_results(exclude=label))
+
+    if not options.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{label}.json")
+        with open(path, 'w') as f:
+            json.dump({
+                'label': label,
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPU)",
+                'quick': options.quick,
+                'results': results,
+            }, f, indent=4)
+        print(f"Результаты сохранены: {path}")
+
+    for problem in problems:
+        print(f"ОШИБКА: {problem}")
+    if not baseline_path or not os.path.exists(baseline_path):
+        return 1 if problems else 0
+    regressions = compare(results, baseline_path, options.threshold)
+    for regression in regressions:
+        print(f"РЕГРЕССИЯ: {regression}")
+    return 1 if regressions or problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
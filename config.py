@@ -1,21 +1,146 @@
 import os
+import copy
 import json
+import atexit
+import sqlite3
+import tempfile
 import threading
+from types import MappingProxyType
+
+# Mutations within this window are written to disk together
+SAVE_DELAY = 1.0
+# Subscriber and monitoring entries above which config moves from JSON to SQLite
+SQLITE_THRESHOLD = 5000
+
+
+def _collection_size(data):
+    return len(data.get('subscribers', [])) + sum(len(v) for v in data.get('monitored_currencies', {}).values())
+
+
+def _freeze(value):
+    # Nested dicts become read-only views and lists become tuples
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+class JSONConfigStorage:
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, data, changed):
+        # Temp file + rename: a crash mid-write never leaves a truncated config.json
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.config-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class SQLiteConfigStorage:
+    """One row per key; subscribers and monitored currencies get a row per entry,
+    so a save only writes what changed since the previous one."""
+
+    def __init__(self, path):
+        self.path = path
+        self.saved = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS config_subscribers (chat_id INTEGER PRIMARY KEY)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS config_monitored
+                        (chat_id TEXT, currency TEXT, PRIMARY KEY (chat_id, currency))""")
+        return conn
+
+    def load(self):
+        conn = self._connect()
+        try:
+            data = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM config")}
+            data['subscribers'] = [row[0] for row in conn.execute(
+                "SELECT chat_id FROM config_subscribers ORDER BY rowid")]
+            monitored = {}
+            for chat_id, currency in conn.execute("SELECT chat_id, currency FROM config_monitored ORDER BY rowid"):
+                monitored.setdefault(chat_id, []).append(currency)
+            data['monitored_currencies'] = monitored
+        finally:
+            conn.close()
+        self.saved = data
+        return data
+
+    def save(self, data, changed):
+        conn = self._connect()
+        try:
+            with conn:
+                for key in changed:
+                    if key == 'subscribers':
+                        old, new = set(self.saved.get(key, [])), set(data.get(key, []))
+                        conn.executemany("INSERT OR IGNORE INTO config_subscribers VALUES (?)",
+                                         ((chat_id,) for chat_id in new - old))
+                        conn.executemany("DELETE FROM config_subscribers WHERE chat_id = ?",
+                                         ((chat_id,) for chat_id in old - new))
+                    elif key == 'monitored_currencies':
+                        old = {(chat_id, currency) for chat_id, currencies in self.saved.get(key, {}).items()
+                               for currency in currencies}
+                        new = {(chat_id, currency) for chat_id, currencies in data.get(key, {}).items()
+                               for currency in currencies}
+                        conn.executemany("INSERT OR IGNORE INTO config_monitored VALUES (?, ?)", new - old)
+                        conn.executemany("DELETE FROM config_monitored WHERE chat_id = ? AND currency = ?",
+                                         old - new)
+                    elif key in data:
+                        conn.execute("INSERT OR REPLACE INTO config VALUES (?, ?)", (key, json.dumps(data[key])))
+                    else:
+                        conn.execute("DELETE FROM config WHERE key = ?", (key,))
+        finally:
+            conn.close()
+        self.saved = data
 
 
 class Config:
+    """Process-wide settings.
+
+    Reads are lock-free: every mutation publishes a new top-level dict
+    (copy-on-write), so a snapshot is never modified after it is handed out;
+    snapshot() is frozen all the way down.
+    Writes are debounced by SAVE_DELAY and done atomically; subscribers are
+    called after each change.
+    """
+
     _instance = None
-    _lock = threading.Lock()
+    _instance_lock = threading.Lock()
 
     def __new__(cls):
-        with cls._lock:
-            if cls._instance is None:
-                cls._instance = super().__new__(cls)
-                cls._instance._load_config()
-            return cls._instance
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._load_config()
+                    cls._instance = instance
+        return cls._instance
 
     def _load_config(self):
         self.config_path = 'config.json'
+        self.sqlite_path = 'config.db'
         self.default_config = {
             'favorite_pairs': ["BTC/USDT", "ETH/USDT", "SOL/USDT"],
             'subscribers': [],
@@ -25,66 +150,189 @@ class Config:
             'alert_settings': {},
             'telegram_channels': ["cryptosignals", "whalepool", "altcoinbuzz"],
             'whale_rating': {},
+            'exchange_addresses': {},
+            'candle_retention_days': {'15m': 90, '1h': 730},
+            'candle_sync_days': 365,
+            'portfolio_window': 30,
+            'price_board': True,
+            'price_board_capacity': 1024,
+            'price_feed_interval': 10,
+            'price_exchanges': ['binance', 'okx', 'bybit', 'kraken', 'kucoin'],
+            'price_quorum': 2,
+            'price_timeout': 5,
+            'price_max_deviation': 0.02,
             'lstm_models': {},
+            'lstm_features': ['Close'],
+            'lstm_batch_size': 32,
+            'tf_intra_op_threads': 0,
+            'tf_inter_op_threads': 0,
+            'lstm_max_epochs': 50,
+            'lstm_patience': 5,
+            'lstm_time_budget': 300,
+            'lstm_search_ttl': 604800,
+            'lstm_hyperparams': {},
+            'forecast_backend': 'ridge',
+            'forecast_backends': {},
+            'alert_check_interval': 60,
+            'whale_check_interval': 60,
+            'metrics_port': 9108,
+            'profile_seconds': 30,
+            'deepseek_api_url': 'https://api.deepseek.com/v1/chat/completions',
+            'ai_cache_ttl': 900,
+            'ai_max_concurrency': 2,
             'auto_improvement': True
         }
 
+        self._lock = threading.RLock()
+        self._save_lock = threading.RLock()
+        self._dirty = set()
+        self._timer = None
+        self._subscribers = []
+        self._frozen = (None, None)
+
+        if os.path.exists(self.sqlite_path):
+            self.storage = SQLiteConfigStorage(self.sqlite_path)
+        else:
+            self.storage = JSONConfigStorage(self.config_path)
+
+        load_failed = False
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r') as f:
-                    self.data = json.load(f)
-            else:
-                self.data = self.default_config.copy()
-                self.save()
-
-            # Add missing keys
-            for key, value in self.default_config.items():
-                if key not in self.data:
-                    self.data[key] = value
-                    self.save()
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            data = self.storage.load() if self.storage.exists() else {}
+        except (FileNotFoundError, json.JSONDecodeError, sqlite3.Error) as e:
             print(f"Config load error: {e}")
-            self.data = self.default_config.copy()
+            data, load_failed = {}, True
 
-    def save(self):
-        with open(self.config_path, 'w') as f:
-            json.dump(self.data, f, indent=4)
+        # Add missing keys, written once rather than once per key
+        missing = [key for key in self.default_config if key not in data]
+        for key in missing:
+            data[key] = copy.deepcopy(self.default_config[key])
+        self._data = data
+        if missing and not load_failed:
+            self._dirty.update(missing)
+            self.flush()
+        atexit.register(self.flush)
+
+    @property
+    def data(self):
+        return self.snapshot()
+
+    def snapshot(self):
+        # Frozen once per published dict: a published dict is never changed, so the copy stays valid
+        data, frozen = self._frozen
+        if data is not self._data:
+            data = self._data
+            frozen = _freeze(data)
+            self._frozen = (data, frozen)
+        return frozen
 
     def __getitem__(self, key):
-        return self.data[key]
+        return self._data[key]
 
     def __setitem__(self, key, value):
-        with self._lock:
-            self.data[key] = value
-            self.save()
+        self.update({key: value})
 
     def get(self, key, default=None):
-        return self.data.get(key, default)
+        return self._data.get(key, default)
+
+    def _commit(self, changes):
+        # Caller holds self._lock; returns {key: (old, new)} for keys whose value changed
+        old = self._data
+        self._data = {**old, **changes}
+        self._dirty.update(changes)
+        if self._timer is None:
+            self._timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        return {key: (old.get(key), value) for key, value in changes.items() if old.get(key) != value}
+
+    def update(self, changes):
+        with self._lock:
+            changed = self._commit(dict(changes))
+        self._notify(changed)
+
+    def subscribe(self, callback, keys=None):
+        """callback(key, old, new) is called after a change to one of keys (any key if None)."""
+        with self._lock:
+            self._subscribers = self._subscribers + [(callback, frozenset(keys) if keys else None)]
+        return callback
+
+    def unsubscribe(self, callback):
+        # Compared by equality: a bound method is a new object on every attribute access
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] != callback]
+
+    def _notify(self, changed):
+        for key, (old, new) in changed.items():
+            for callback, keys in self._subscribers:
+                if keys is None or key in keys:
+                    try:
+                        callback(key, old, new)
+                    except Exception as e:
+                        print(f"Config subscriber error: {e}")
+
+    def flush(self):
+        """Writes pending changes now."""
+        with self._save_lock:
+            with self._lock:
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                data, changed = self._data, self._dirty
+                self._dirty = set()
+            if not changed:
+                return
+            if isinstance(self.storage, JSONConfigStorage) and _collection_size(data) > SQLITE_THRESHOLD:
+                self.migrate_to_sqlite()
+                return
+            try:
+                self.storage.save(data, changed)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Config save error: {e}")
+                with self._lock:
+                    self._dirty |= changed
+
+    def save(self):
+        with self._lock:
+            self._dirty.update(self._data)
+        self.flush()
+
+    def migrate_to_sqlite(self):
+        """Moves config.json into config.db (kept as config.json.migrated)."""
+        with self._save_lock:
+            storage = SQLiteConfigStorage(self.sqlite_path)
+            with self._lock:
+                data = self._data
+                self._dirty = set()
+            storage.save(data, set(data))
+            if os.path.exists(self.config_path):
+                os.replace(self.config_path, self.config_path + '.migrated')
+            self.storage = storage
+            print(f"Config migrated to {self.sqlite_path}: {_collection_size(data)} subscriber/monitoring entries")
 
     def update_monitored_currency(self, chat_id, currency, add=True):
         with self._lock:
             chat_id = str(chat_id)
-            if chat_id not in self.data['monitored_currencies']:
-                self.data['monitored_currencies'][chat_id] = []
+            monitored = dict(self._data['monitored_currencies'])
+            currencies = list(monitored.get(chat_id, []))
 
             if add:
-                if currency not in self.data['monitored_currencies'][chat_id]:
-                    self.data['monitored_currencies'][chat_id].append(currency)
+                if currency not in currencies:
+                    currencies.append(currency)
             else:
-                if currency in self.data['monitored_currencies'][chat_id]:
-                    self.data['monitored_currencies'][chat_id].remove(currency)
+                if currency in currencies:
+                    currencies.remove(currency)
 
-            self.save()
+            monitored[chat_id] = currencies
+            changed = self._commit({'monitored_currencies': monitored})
+        self._notify(changed)
 
     def get_lstm_model_path(self, symbol):
-        return self.data['lstm_models'].get(symbol)
+        return self._data['lstm_models'].get(symbol)
 
     def set_lstm_model_path(self, symbol, path):
         with self._lock:
-            self.data['lstm_models'][symbol] = path
-            self.save()
+            changed = self._commit({'lstm_models': {**self._data['lstm_models'], symbol: path}})
+        self._notify(changed)
 
     def toggle_auto_improvement(self, status):
-        with self._lock:
-            self.data['auto_improvement'] = status
-            self.save()
\ No newline at end of file
+        self.update({'auto_improvement': status})
@@ -1,39 +1,74 @@
+import os
+import re
+import hashlib
 import sqlite3
 import threading
 import pandas as pd
 from datetime import datetime, timedelta
 
+# database is also imported as a top-level module (launcher.py)
+try:
+    from .metrics import timed
+except ImportError:
+    from metrics import timed
+
 db_lock = threading.Lock()
 
+TIMEFRAME_MS = {'1m': 60000, '5m': 300000, '15m': 900000, '1h': 3600000, '4h': 14400000, '1d': 86400000}
+# Candles are fetched in BASE_TIMEFRAME; each rollup is aggregated from the level below it
+BASE_TIMEFRAME = '15m'
+ROLLUPS = (('1h', '15m'), ('4h', '1h'), ('1d', '4h'))
+# Days of candles kept per timeframe (None: forever); Config['candle_retention_days'] overrides
+DEFAULT_RETENTION_DAYS = {'15m': 90, '1h': 730, '4h': None, '1d': None}
+FAR_FUTURE = 2 ** 40
+
+# candles stores integers only: symbol as an id from `symbols`, timeframe in
+# minutes and timestamp in seconds (the API keeps ccxt's milliseconds).
+# Ids of crypto_data.db, cached only once their row is committed.
+_symbol_ids = {}
+
+# Parts of an error message that differ between occurrences of the same error
+_VOLATILE_PATTERNS = [
+    (re.compile(r'0x[0-9a-fA-F]+'), '0x?'),
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), '<uuid>'),
+    (re.compile(r'\d+(\.\d+)?'), '?'),
+]
+
+
+def error_fingerprint(module, error_text):
+    # Module + first message line + traceback frames, with ids, numbers and line numbers removed
+    lines = str(error_text).splitlines()
+    message = lines[0] if lines else ''
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        message = pattern.sub(replacement, message)
+    frames = [re.sub(r', line \d+', '', line.strip()) for line in lines if line.strip().startswith('File "')]
+    raw = '\n'.join([module, message] + frames)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _migrate_error_logs(c):
+    # Databases created before fingerprinting: add the columns and backfill them
+    columns = {row[1] for row in c.execute("PRAGMA table_info(error_logs)")}
+    for column, definition in (('fingerprint', 'TEXT'), ('occurrences', 'INTEGER DEFAULT 1'),
+                               ('first_seen', 'INTEGER'), ('last_seen', 'INTEGER')):
+        if column not in columns:
+            c.execute(f"ALTER TABLE error_logs ADD COLUMN {column} {definition}")
+    rows = c.execute("SELECT rowid, module, error_text, timestamp FROM error_logs WHERE fingerprint IS NULL").fetchall()
+    c.executemany('''UPDATE error_logs
+                     SET fingerprint = ?, occurrences = 1, first_seen = ?, last_seen = ?
+                     WHERE rowid = ?''',
+                  ((error_fingerprint(module, text), ts, ts, rowid) for rowid, module, text, ts in rows))
+
 
 def init_db():
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
         c = conn.cursor()
 
-        # Historical price data
-        c.execute('''CREATE TABLE IF NOT EXISTS historical_data
-        (
-            symbol
-            TEXT,
-            timestamp
-            INTEGER,
-            open
-            REAL,
-            high
-            REAL,
-            low
-            REAL,
-            close
-            REAL,
-            volume
-            REAL,
-            PRIMARY
-            KEY
-                     (
-            symbol,
-            timestamp
-                     ))''')
+        # Candles of every timeframe
+        _symbol_ids.clear()
+        _create_candle_tables(c)
+        _migrate_candles(c)
 
         # Whale transactions
         c.execute('''CREATE TABLE IF NOT EXISTS whale_transactions
@@ -95,56 +130,271 @@ def init_db():
                          resolved
                          INTEGER
                          DEFAULT
-                         0
+                         0,
+                         fingerprint
+                         TEXT,
+                         occurrences
+                         INTEGER
+                         DEFAULT
+                         1,
+                         first_seen
+                         INTEGER,
+                         last_seen
+                         INTEGER
+                     )''')
+        _migrate_error_logs(c)
+
+        # Cached AI responses, keyed by a hash of the normalised request
+        c.execute('''CREATE TABLE IF NOT EXISTS ai_responses
+                     (
+                         cache_key TEXT PRIMARY KEY,
+                         response TEXT,
+                         created_at INTEGER
                      )''')
 
         # Indexes
-        c.execute('''CREATE INDEX IF NOT EXISTS idx_symbol_time
-            ON historical_data (symbol, timestamp)''')
         c.execute('''CREATE INDEX IF NOT EXISTS idx_user_currency
             ON user_alerts (user_id, currency)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_error_fingerprint
+            ON error_logs (resolved, fingerprint)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_whale_currency_time
+            ON whale_transactions (currency, timestamp)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_whale_from
+            ON whale_transactions (from_address)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_whale_to
+            ON whale_transactions (to_address)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_ai_created
+            ON ai_responses (created_at)''')
 
         conn.commit()
         return conn
 
 
+def _timeframe_code(timeframe):
+    return TIMEFRAME_MS[timeframe] // 60000
+
+
+def _timeframe_from_step(step_ms):
+    # The stored timeframe closest to the spacing of a symbol's candles
+    return min(TIMEFRAME_MS, key=lambda timeframe: abs(TIMEFRAME_MS[timeframe] - step_ms))
+
+
+def _lookup_symbol_id(cursor, symbol, create=False):
+    row = cursor.execute("SELECT id FROM symbols WHERE symbol = ?", (symbol,)).fetchone()
+    if row is not None:
+        return row[0]
+    if not create:
+        return None
+    cursor.execute("INSERT INTO symbols (symbol) VALUES (?)", (symbol,))
+    return cursor.lastrowid
+
+
+def _symbol_id(cursor, symbol, create=False):
+    symbol_id = _symbol_ids.get(symbol)
+    if symbol_id is None:
+        symbol_id = _lookup_symbol_id(cursor, symbol, create)
+        # A row inserted by the open transaction is cached by the caller after commit
+        if symbol_id is not None and not cursor.connection.in_transaction:
+            _symbol_ids[symbol] = symbol_id
+    return symbol_id
+
+
+def _create_candle_tables(c):
+    # One table clustered by (symbol, timeframe, time): a range query reads adjacent pages
+    c.execute('''CREATE TABLE IF NOT EXISTS symbols
+                 (
+                     id INTEGER PRIMARY KEY,
+                     symbol TEXT UNIQUE NOT NULL
+                 )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS candles
+                 (
+                     symbol_id INTEGER,
+                     timeframe INTEGER,
+                     timestamp INTEGER,
+                     open REAL,
+                     high REAL,
+                     low REAL,
+                     close REAL,
+                     volume REAL,
+                     PRIMARY KEY (symbol_id, timeframe, timestamp)
+                 ) WITHOUT ROWID''')
+
+
+def _migrate_candles(c):
+    # historical_data (TEXT symbol, millisecond timestamps) and the ohlcv_* rollups predate `candles`
+    tables = {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'historical_data' not in tables:
+        return
+    # The database may not be crypto_data.db (migrate_storage): ids bypass the module cache
+    symbols = [row[0] for row in c.execute("SELECT DISTINCT symbol FROM historical_data")]
+    for symbol in symbols:
+        symbol_id = _lookup_symbol_id(c, symbol, create=True)
+        # Before the rollups, candles of whatever timeframe was requested were stored here
+        steps = c.execute('''SELECT MIN(next - timestamp) FROM (
+                                 SELECT timestamp, LEAD(timestamp) OVER (ORDER BY timestamp) AS next
+                                 FROM historical_data WHERE symbol = ?)''', (symbol,)).fetchone()[0]
+        timeframe = _timeframe_from_step(steps) if steps else BASE_TIMEFRAME
+        c.execute('''INSERT OR REPLACE INTO candles
+                     (symbol_id, timeframe, timestamp, open, high, low, close, volume)
+                     SELECT ?, ?, timestamp / 1000, open, high, low, close, volume
+                     FROM historical_data WHERE symbol = ?''', (symbol_id, _timeframe_code(timeframe), symbol))
+        _update_rollups(c, symbol_id, 0, FAR_FUTURE)
+    c.execute("DROP TABLE historical_data")
+    for name in tables:
+        if name.startswith('ohlcv_'):
+            c.execute(f"DROP TABLE {name}")
+
+
+def migrate_storage(path='crypto_data.db'):
+    """Moves an existing database to the compact candle layout; returns (bytes before, bytes after)."""
+    before = os.path.getsize(path)
+    with db_lock:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        c = conn.cursor()
+        _create_candle_tables(c)
+        _migrate_candles(c)
+        conn.commit()
+        # Pages freed by the dropped tables go back to the file system
+        conn.execute("VACUUM")
+        conn.close()
+    return before, os.path.getsize(path)
+
+
+def _update_rollups(cursor, symbol_id, start, end):
+    # Re-aggregates only the buckets that contain [start, end] (seconds), level by level.
+    # Open and close are primary key lookups of each bucket's first and last source candle.
+    for timeframe, source in ROLLUPS:
+        size = TIMEFRAME_MS[timeframe] // 1000
+        start, end = start // size * size, end // size * size + size
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO candles
+            (symbol_id, timeframe, timestamp, open, high, low, close, volume)
+            SELECT :symbol_id, :timeframe, bucket,
+                   (SELECT open FROM candles
+                    WHERE symbol_id = :symbol_id AND timeframe = :source AND timestamp = first),
+                   high, low,
+                   (SELECT close FROM candles
+                    WHERE symbol_id = :symbol_id AND timeframe = :source AND timestamp = last),
+                   volume
+            FROM (
+                SELECT timestamp / {size} * {size} AS bucket, MIN(timestamp) AS first, MAX(timestamp) AS last,
+                       MAX(high) AS high, MIN(low) AS low, SUM(volume) AS volume
+                FROM candles
+                WHERE symbol_id = :symbol_id AND timeframe = :source AND timestamp >= :start AND timestamp < :end
+                GROUP BY bucket
+            )
+        ''', {'symbol_id': symbol_id, 'timeframe': _timeframe_code(timeframe), 'source': _timeframe_code(source),
+              'start': start, 'end': end})
+
+
+@timed('db.fetch_historical_data')
 def fetch_historical_data(symbol, days=30):
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     start_timestamp = int(start_date.timestamp() * 1000)
     end_timestamp = int(end_date.timestamp() * 1000)
+    return get_candles(symbol, BASE_TIMEFRAME, start_timestamp, end_timestamp)
+
 
+@timed('db.save_historical_data')
+def save_historical_data(symbol, data):
+    # Candles of BASE_TIMEFRAME; the rollups are brought up to date in the same transaction
+    if not data:
+        return
+    timeframe = _timeframe_code(BASE_TIMEFRAME)
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
-        query = f"""
-            SELECT timestamp, open, high, low, close, volume
-            FROM historical_data
-            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+        cursor = conn.cursor()
+        try:
+            symbol_id = _symbol_id(cursor, symbol, create=True)
+            rows = [(symbol_id, timeframe, int(row[0]) // 1000, row[1], row[2], row[3], row[4], row[5])
+                    for row in data]
+            cursor.executemany('''
+                INSERT OR REPLACE INTO candles
+                (symbol_id, timeframe, timestamp, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            timestamps = [row[2] for row in rows]
+            _update_rollups(cursor, symbol_id, min(timestamps), max(timestamps))
+            conn.commit()
+        except Exception:
+            # Releases the write lock now rather than when the connection is collected
+            conn.rollback()
+            raise
+        _symbol_ids[symbol] = symbol_id
+
+
+@timed('db.get_last_candle_time')
+def get_last_candle_time(symbol):
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        symbol_id = _symbol_id(conn.cursor(), symbol)
+        row = conn.execute('''SELECT MAX(timestamp) FROM candles
+                              WHERE symbol_id = ? AND timeframe = ?''',
+                           (symbol_id, _timeframe_code(BASE_TIMEFRAME))).fetchone()
+        return row[0] * 1000 if row[0] is not None else None
+
+
+@timed('db.get_candles')
+def get_candles(symbol, timeframe, since=0, until=None):
+    """Candles of any stored timeframe (millisecond timestamps) as one range scan over the primary key."""
+    if timeframe != BASE_TIMEFRAME and timeframe not in dict(ROLLUPS):
+        raise ValueError(f"Timeframe {timeframe} is not stored (base {BASE_TIMEFRAME}, rollups {', '.join(dict(ROLLUPS))})")
+    until = FAR_FUTURE if until is None else until // 1000
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        symbol_id = _symbol_id(conn.cursor(), symbol)
+        query = '''
+            SELECT timestamp * 1000 AS timestamp, open, high, low, close, volume
+            FROM candles
+            WHERE symbol_id = ? AND timeframe = ? AND timestamp >= ? AND timestamp <= ?
             ORDER BY timestamp ASC
-        """
-        df = pd.read_sql_query(query, conn, params=(symbol, start_timestamp, end_timestamp))
-        return df
+        '''
+        return pd.read_sql_query(query, conn, params=(symbol_id, _timeframe_code(timeframe), -(-since // 1000), until))
 
 
-def save_historical_data(symbol, data):
+@timed('db.get_close_matrix')
+def get_close_matrix(symbols, timeframe, since=0):
+    """Closes of several symbols in one query, long format (symbol, timestamp in ms, close)."""
+    if timeframe != BASE_TIMEFRAME and timeframe not in dict(ROLLUPS):
+        raise ValueError(f"Timeframe {timeframe} is not stored (base {BASE_TIMEFRAME}, rollups {', '.join(dict(ROLLUPS))})")
+    symbols = list(symbols)
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        placeholders = ', '.join('?' * len(symbols))
+        query = f'''
+            SELECT symbols.symbol, candles.timestamp * 1000 AS timestamp, candles.close
+            FROM symbols
+            JOIN candles ON candles.symbol_id = symbols.id
+            WHERE symbols.symbol IN ({placeholders}) AND candles.timeframe = ? AND candles.timestamp >= ?
+            ORDER BY candles.timestamp
+        '''
+        return pd.read_sql_query(query, conn, params=(*symbols, _timeframe_code(timeframe), -(-since // 1000)))
+
+
+@timed('db.prune_candles')
+def prune_candles(retention_days=None):
+    """Deletes candles older than each timeframe's retention; returns the number of rows removed."""
+    retention_days = {**DEFAULT_RETENTION_DAYS, **(retention_days or {})}
+    now = int(datetime.utcnow().timestamp())
+    removed = 0
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
         cursor = conn.cursor()
-        for row in data:
-            timestamp = row[0]
-            open_price = row[1]
-            high = row[2]
-            low = row[3]
-            close = row[4]
-            volume = row[5]
-            cursor.execute('''
-                INSERT OR REPLACE INTO historical_data
-                (symbol, timestamp, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (symbol, timestamp, open_price, high, low, close, volume))
+        symbol_ids = [row[0] for row in cursor.execute("SELECT id FROM symbols")]
+        for timeframe, days in retention_days.items():
+            if not days or timeframe not in TIMEFRAME_MS:
+                continue
+            # One primary-key range per symbol instead of a full scan
+            cursor.executemany('''DELETE FROM candles
+                                  WHERE symbol_id = ? AND timeframe = ? AND timestamp < ?''',
+                               ((symbol_id, _timeframe_code(timeframe), now - days * 86400) for symbol_id in symbol_ids))
+            removed += cursor.rowcount
         conn.commit()
+    return removed
 
 
+@timed('db.add_user_alert')
 def add_user_alert(user_id, currency, condition_type, threshold):
     try:
         with db_lock:
@@ -162,6 +412,7 @@ def add_user_alert(user_id, currency, condition_type, threshold):
         return False
 
 
+@timed('db.get_active_alerts')
 def get_active_alerts():
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
@@ -169,6 +420,7 @@ def get_active_alerts():
         return pd.read_sql_query(query, conn)
 
 
+@timed('db.save_whale_transaction')
 def save_whale_transaction(transaction):
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
@@ -183,35 +435,155 @@ def save_whale_transaction(transaction):
         conn.commit()
 
 
+@timed('db.get_known_whale_hashes')
+def get_known_whale_hashes(tx_hashes):
+    tx_hashes = list(tx_hashes)
+    if not tx_hashes:
+        return set()
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        placeholders = ', '.join('?' * len(tx_hashes))
+        rows = conn.execute(f"SELECT tx_hash FROM whale_transactions WHERE tx_hash IN ({placeholders})",
+                            tx_hashes).fetchall()
+        return {row[0] for row in rows}
+
+
+@timed('db.get_whale_transactions_page')
+def get_whale_transactions_page(after_rowid=0, limit=100000):
+    # Keyset pagination: the table is read in pages, never held in memory (or under the lock) at once
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        query = '''
+                SELECT rowid, currency, amount_usd, from_address, to_address, timestamp
+                FROM whale_transactions
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+                '''
+        return pd.read_sql_query(query, conn, params=(after_rowid, limit))
+
+
+@timed('db.get_whale_transactions_since')
+def get_whale_transactions_since(currency, since):
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        query = '''
+                SELECT amount_usd, from_address, to_address, timestamp
+                FROM whale_transactions
+                WHERE currency = ? AND timestamp >= ?
+                '''
+        return pd.read_sql_query(query, conn, params=(currency, since))
+
+
+@timed('db.get_address_transactions')
+def get_address_transactions(address, limit=50):
+    # Each half of the union is served by its own address index
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        query = '''
+                SELECT * FROM (
+                    SELECT * FROM whale_transactions WHERE from_address = ?
+                    UNION
+                    SELECT * FROM whale_transactions WHERE to_address = ?
+                )
+                ORDER BY timestamp DESC
+                LIMIT ?
+                '''
+        return pd.read_sql_query(query, conn, params=(address, address, limit))
+
+
+@timed('db.log_error')
 def log_error(module, error_text):
+    # Repeats of an unresolved error only bump its counter and last_seen
+    fingerprint = error_fingerprint(module, error_text)
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
         cursor = conn.cursor()
         timestamp = int(datetime.utcnow().timestamp())
         cursor.execute('''
-                       INSERT INTO error_logs (timestamp, module, error_text)
-                       VALUES (?, ?, ?)
-                       ''', (timestamp, module, str(error_text)))
+                       UPDATE error_logs
+                       SET occurrences = occurrences + 1, last_seen = ?, error_text = ?
+                       WHERE rowid = (SELECT rowid FROM error_logs
+                                      WHERE resolved = 0 AND fingerprint = ? LIMIT 1)
+                       ''', (timestamp, str(error_text), fingerprint))
+        if cursor.rowcount == 0:
+            cursor.execute('''
+                           INSERT INTO error_logs (timestamp, module, error_text, fingerprint,
+                                                   occurrences, first_seen, last_seen)
+                           VALUES (?, ?, ?, ?, 1, ?, ?)
+                           ''', (timestamp, module, str(error_text), fingerprint, timestamp, timestamp))
         conn.commit()
 
 
-def get_unresolved_errors():
+@timed('db.get_unresolved_errors')
+def get_unresolved_errors(limit=None):
+    # One row per fingerprint, most frequent first; module and text come from its latest row
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
-        query = "SELECT * FROM error_logs WHERE resolved = 0"
+        query = '''
+                SELECT g.rowid, g.fingerprint, e.module, e.error_text,
+                       g.occurrences, g.first_seen, g.last_seen
+                FROM (SELECT MAX(rowid) AS rowid, fingerprint, SUM(occurrences) AS occurrences,
+                             MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen
+                      FROM error_logs
+                      WHERE resolved = 0
+                      GROUP BY fingerprint) AS g
+                JOIN error_logs AS e ON e.rowid = g.rowid
+                ORDER BY g.occurrences DESC
+                '''
+        if limit:
+            query += f" LIMIT {int(limit)}"
         return pd.read_sql_query(query, conn)
 
 
+@timed('db.mark_error_resolved')
 def mark_error_resolved(error_id):
+    # Resolves every unresolved row with the same fingerprint
     with db_lock:
         conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
         cursor = conn.cursor()
         cursor.execute('''
                        UPDATE error_logs
                        SET resolved = 1
-                       WHERE rowid = ?
-                       ''', (error_id,))
+                       WHERE resolved = 0
+                         AND (rowid = ? OR fingerprint = (SELECT fingerprint FROM error_logs WHERE rowid = ?))
+                       ''', (error_id, error_id))
+        conn.commit()
+
+
+@timed('db.get_ai_response')
+def get_ai_response(cache_key, max_age):
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        row = conn.execute('''
+                           SELECT response
+                           FROM ai_responses
+                           WHERE cache_key = ? AND created_at >= ?
+                           ''', (cache_key, int(datetime.utcnow().timestamp()) - max_age)).fetchone()
+        return row[0] if row else None
+
+
+@timed('db.save_ai_response')
+def save_ai_response(cache_key, response):
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        cursor = conn.cursor()
+        cursor.execute('''
+                       INSERT OR REPLACE INTO ai_responses (cache_key, response, created_at)
+                       VALUES (?, ?, ?)
+                       ''', (cache_key, response, int(datetime.utcnow().timestamp())))
+        conn.commit()
+
+
+@timed('db.prune_ai_responses')
+def prune_ai_responses(max_age):
+    """Deletes cached AI responses older than max_age seconds; returns the number of rows removed."""
+    with db_lock:
+        conn = sqlite3.connect('crypto_data.db', check_same_thread=False)
+        cursor = conn.execute('DELETE FROM ai_responses WHERE created_at < ?',
+                              (int(datetime.utcnow().timestamp()) - max_age,))
         conn.commit()
+        return cursor.rowcount
 
 
 # Initialize database on import
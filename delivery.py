@@ -0,0 +1,84 @@
+import time
+from .utils import log_error
+from .dispatcher import Photo, get_dispatcher, split_message
+
+CAPTION_LIMIT = 1000
+MESSAGE_LIMIT = 4096
+
+
+class ChartDelivery:
+    """Sends one rendered chart to many chats.
+
+    The sends are queued on the bot's NotificationDispatcher, under the same
+    rate limits as every other message. The PNG is uploaded from memory
+    once; Telegram's file_id from the first successful upload is reused for
+    every other chat.
+    """
+
+    def __init__(self, bot, dispatcher=None):
+        self.bot = bot
+        self.dispatcher = dispatcher or get_dispatcher(bot)
+
+    def send_chart(self, chat_ids, png_bytes, report, filename='chart.png'):
+        """Queues the chart for every chat; the returned Photo holds the file_id once uploaded."""
+        caption, rest = report[:CAPTION_LIMIT], report[CAPTION_LIMIT:]
+        photo = Photo(png_bytes, filename)
+        for chat_id in chat_ids:
+            self.dispatcher.send_photo(chat_id, photo, caption=caption, text=rest)
+        return photo
+
+
+def _not_modified(error):
+    # Telegram rejects an edit that would leave the message as it is
+    return 'message is not modified' in str(error)
+
+
+def _format_page(bot, chat_id, message_id, page):
+    # Markdown the model got wrong is left as plain text rather than failing the answer
+    try:
+        bot.edit_message_text(page, chat_id, message_id, parse_mode='Markdown')
+    except Exception as e:
+        if _not_modified(e):
+            return
+        try:
+            bot.edit_message_text(page, chat_id, message_id)
+        except Exception as e:
+            if not _not_modified(e):
+                raise
+
+
+def send_streaming(bot, chat_id, chunks, interval=1.5):
+    """Shows a streamed answer while it is generated.
+
+    The first chunk is sent as a message which is then edited at most every
+    `interval` seconds (Telegram rate-limits edits); text beyond
+    MESSAGE_LIMIT continues in follow-up messages. Once the stream ends every
+    message is edited to its final text with Markdown, or as plain text if
+    the Markdown does not parse.
+    """
+    text, messages, shown, last_edit = '', [], [], 0.0
+    try:
+        for chunk in chunks:
+            text += chunk
+            if not text.strip():
+                continue
+            pages = split_message(text)
+            if messages and len(pages) == len(messages) and time.monotonic() - last_edit < interval:
+                continue
+            # Pages before the last are complete; only the last one still grows
+            for index, page in enumerate(pages):
+                if index == len(messages):
+                    messages.append(bot.send_message(chat_id, page))
+                    shown.append(page)
+                elif page != shown[index]:
+                    bot.edit_message_text(page, chat_id, messages[index].message_id)
+                    shown[index] = page
+            last_edit = time.monotonic()
+
+        for index, page in enumerate(split_message(text) if messages else []):
+            if index == len(messages):
+                messages.append(bot.send_message(chat_id, page))
+            _format_page(bot, chat_id, messages[index].message_id, page)
+    except Exception as e:
+        log_error("STREAM_DELIVERY", f"Chat {chat_id} error: {e}")
+    return text
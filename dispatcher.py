@@ -0,0 +1,343 @@
+import io
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+# dispatcher is also imported as a top-level module (benchmarks/dispatcher_load.py)
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+# Telegram limits: ~30 messages/s overall, ~1 message/s per chat
+GLOBAL_RATE = 25
+PER_CHAT_RATE = 1
+MESSAGE_LIMIT = 4096
+# Seconds between sweeps that drop per-chat buckets which have refilled completely
+BUCKET_SWEEP_INTERVAL = 60.0
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        with self.lock:
+            self._refill()
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        # May go negative under contention; later wait_time() calls absorb it
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+
+    def pause(self, seconds):
+        # Used on Telegram "retry after": drain the bucket for the given time
+        with self.lock:
+            self.tokens = -seconds * self.rate
+            self.updated = time.monotonic()
+
+    def full(self):
+        """True if the bucket has refilled, i.e. it behaves like a new one."""
+        with self.lock:
+            self._refill()
+            return self.tokens >= self.capacity
+
+
+class Photo:
+    """An image sent to many chats: uploaded once, then reused by Telegram file_id."""
+
+    def __init__(self, data, filename='image.png'):
+        self.data = data
+        self.filename = filename
+        self.file_id = None
+        self.lock = threading.Lock()
+
+    def send(self, bot, chat_id, caption=None, parse_mode=None):
+        file_id = self.file_id
+        if file_id is None:
+            # Other senders wait for the first upload instead of uploading the image again
+            with self.lock:
+                file_id = self.file_id
+                if file_id is None:
+                    upload = io.BytesIO(self.data)
+                    upload.name = self.filename
+                    message = bot.send_photo(chat_id, upload, caption=caption, parse_mode=parse_mode)
+                    if getattr(message, 'photo', None):
+                        self.file_id = message.photo[-1].file_id
+                    return message
+        return bot.send_photo(chat_id, file_id, caption=caption, parse_mode=parse_mode)
+
+
+class Notification:
+    __slots__ = ('chat_id', 'text', 'priority', 'parse_mode', 'coalesce_key', 'attempts', 'chunks', 'next_chunk',
+                 'photo', 'caption')
+
+    def __init__(self, chat_id, text, priority, parse_mode, coalesce_key=None, photo=None, caption=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.priority = priority
+        self.parse_mode = parse_mode
+        self.coalesce_key = coalesce_key
+        self.photo = photo
+        self.caption = caption
+        self.attempts = 0
+        # Split on first send; a retry or a rate-limit delay resumes from next_chunk
+        self.chunks = None
+        self.next_chunk = 0
+
+
+def retry_after(error):
+    """Seconds to wait from a Telegram 429 error (telebot ApiTelegramException), else None."""
+    if getattr(error, 'error_code', None) != 429:
+        return None
+    result = getattr(error, 'result_json', None) or {}
+    return float(result.get('parameters', {}).get('retry_after', 1))
+
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        cut = cut if cut > 0 else limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    chunks.append(text)
+    return chunks
+
+
+class NotificationDispatcher:
+    """Queue-based sender for bot notifications.
+
+    Messages are sent by a worker pool in priority order under a global and a
+    per-chat token bucket. Telegram 429 responses pause sending for the given
+    retry_after. Messages sharing a coalesce_key are buffered per chat for
+    coalesce_window seconds and sent as one digest. A long message is sent
+    chunk by chunk, each taking its own tokens; a failure resends only the
+    chunks not yet delivered. A photo goes out the same way, as the first
+    chunk of its notification.
+    """
+
+    def __init__(self, bot, workers=4, global_rate=GLOBAL_RATE, per_chat_rate=PER_CHAT_RATE,
+                 coalesce_window=5.0, max_retries=3):
+        self.bot = bot
+        self.workers = workers
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + BUCKET_SWEEP_INTERVAL
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'coalesced': 0}
+        self._ready = []
+        self._delayed = []
+        self._pending = {}
+        self._seq = itertools.count()
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self.running = False
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending(self):
+        with self._cond:
+            return len(self._ready) + len(self._delayed) + len(self._pending)
+
+    def join(self, timeout=None):
+        """Blocks until all queued messages are handled (for tests and shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending() or self._busy:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _schedule(self, notification, delay=0.0):
+        # Caller must hold self._cond
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), notification))
+        else:
+            heapq.heappush(self._ready, (notification.priority, next(self._seq), notification))
+        self._cond.notify()
+
+    def send(self, chat_id, text, priority=PRIORITY_NORMAL, parse_mode='Markdown', coalesce_key=None):
+        if not self.running:
+            self.start()
+        with self._cond:
+            if coalesce_key is None:
+                self._schedule(Notification(chat_id, text, priority, parse_mode))
+                return
+
+            key = (chat_id, coalesce_key)
+            if key in self._pending:
+                self._pending[key].append(text)
+                self.stats['coalesced'] += 1
+                return
+            # The flush marker carries no text; it collects the buffer when due
+            self._pending[key] = [text]
+            self._schedule(Notification(chat_id, None, priority, parse_mode, coalesce_key),
+                           self.coalesce_window)
+
+    def send_photo(self, chat_id, photo, caption=None, text=None, priority=PRIORITY_NORMAL, parse_mode='Markdown'):
+        """Queues a Photo with its caption, followed by text (e.g. what does not fit the caption)."""
+        if not self.running:
+            self.start()
+        with self._cond:
+            self._schedule(Notification(chat_id, text or '', priority, parse_mode, photo=photo, caption=caption))
+
+    def broadcast(self, chat_ids, text, **kwargs):
+        for chat_id in chat_ids:
+            self.send(chat_id, text, **kwargs)
+
+    def _next(self):
+        with self._cond:
+            while self.running:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, notification = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (notification.priority, next(self._seq), notification))
+                if self._ready:
+                    self._busy += 1
+                    return heapq.heappop(self._ready)[2]
+                timeout = self._delayed[0][0] - now if self._delayed else 1.0
+                self._cond.wait(timeout)
+            return None
+
+    def _collect(self, notification):
+        with self._cond:
+            texts = self._pending.pop((notification.chat_id, notification.coalesce_key), [])
+        if len(texts) > 1:
+            return f"📬 **{len(texts)} new notifications**\n\n" + "\n\n".join(texts)
+        return texts[0] if texts else None
+
+    def _count(self, name):
+        with self._cond:
+            self.stats[name] += 1
+
+    def _take_tokens(self, chat_id):
+        """Takes a per-chat and a global token; returns 0, or the seconds to wait if either is empty.
+
+        Done under _buckets_lock, so a sweep cannot drop the chat's bucket
+        between the lookup and the take and hand the chat a fresh full one.
+        """
+        with self._buckets_lock:
+            if time.monotonic() >= self._next_sweep:
+                # A full bucket is indistinguishable from a new one, so idle chats need not keep theirs
+                self.chat_buckets = {chat_id: bucket for chat_id, bucket in self.chat_buckets.items()
+                                     if not bucket.full()}
+                self._next_sweep = time.monotonic() + BUCKET_SWEEP_INTERVAL
+            chat_bucket = self.chat_buckets.get(chat_id)
+            if chat_bucket is None:
+                chat_bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+            wait = max(chat_bucket.wait_time(), self.global_bucket.wait_time())
+            if not wait:
+                chat_bucket.consume()
+                self.global_bucket.consume()
+            return wait
+
+    def _worker(self):
+        while True:
+            notification = self._next()
+            if notification is None:
+                return
+            try:
+                self._process(notification)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+
+    def _process(self, notification):
+        if notification.text is None:
+            notification.text = self._collect(notification)
+            notification.coalesce_key = None
+            if notification.text is None:
+                return
+
+        if notification.chunks is None:
+            if notification.photo is None:
+                notification.chunks = split_message(notification.text)
+            else:
+                # None marks the photo's place before the text
+                notification.chunks = [None] + (split_message(notification.text) if notification.text else [])
+
+        try:
+            while notification.next_chunk < len(notification.chunks):
+                wait = self._take_tokens(notification.chat_id)
+                if wait:
+                    # The worker is freed; the remaining chunks go out when tokens are available
+                    with self._cond:
+                        self._schedule(notification, wait)
+                    return
+                chunk = notification.chunks[notification.next_chunk]
+                if chunk is None:
+                    with metrics.timer('telegram.send_photo'):
+                        notification.photo.send(self.bot, notification.chat_id, caption=notification.caption,
+                                                parse_mode=notification.parse_mode)
+                else:
+                    with metrics.timer('telegram.send_message'):
+                        self.bot.send_message(notification.chat_id, chunk, parse_mode=notification.parse_mode)
+                notification.next_chunk += 1
+            self._count('sent')
+        except Exception as e:
+            delay = retry_after(e)
+            if delay is not None:
+                self.global_bucket.pause(delay)
+            notification.attempts += 1
+            if notification.attempts > self.max_retries:
+                self._count('failed')
+                logger.error(f"Notification to {notification.chat_id} dropped: {e}")
+                return
+            self._count('retried')
+            with self._cond:
+                self._schedule(notification, delay if delay is not None else 2 ** notification.attempts)
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(bot):
+    """One dispatcher per bot, so every sender shares the same rate limits."""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(id(bot))
+        if dispatcher is None or dispatcher.bot is not bot:
+            dispatcher = _dispatchers[id(bot)] = NotificationDispatcher(bot)
+        return dispatcher
@@ -1,6 +1,7 @@
 import logging
 import traceback
 from .database import log_error
+from .dispatcher import get_dispatcher, PRIORITY_HIGH
 
 
 class ErrorHandler:
@@ -25,13 +26,12 @@ class ErrorHandler:
 
     def notify_admin(self, module, error_msg):
         try:
-            for admin_id in self.bot.config['subscribers']:
-                self.bot.send_message(
-                    admin_id,
-                    f"🚨 **Critical System Error**\n\n"
-                    f"Module: `{module}`\n"
-                    f"Error: `{error_msg[:300]}`",
-                    parse_mode='Markdown'
-                )
+            get_dispatcher(self.bot).broadcast(
+                self.bot.config['subscribers'],
+                f"🚨 **Critical System Error**\n\n"
+                f"Module: `{module}`\n"
+                f"Error: `{error_msg[:300]}`",
+                priority=PRIORITY_HIGH
+            )
         except Exception as e:
             logging.error(f"Admin notify failed: {e}")
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import re
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.preprocessing import MinMaxScaler
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+FEATURE_CACHE_DIR = os.path.join('cache', 'features')
+
+TARGET_COLUMN = 'Close'
+OHLCV_FEATURES = ['Open', 'High', 'Low', 'Close', 'Volume']
+SENTIMENT_FEATURE = 'Sentiment'
+DEFAULT_FEATURES = ['Close']
+
+# Индикаторам нужна история для "прогрева": при дозаписи новых свечей
+# пересчитывается только хвост такой длины, а не весь ряд
+INDICATOR_WARMUP = 250
+
+
+def _rsi(close, period=14):
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+    rs = gain / loss.replace(0, np.nan)
+    return (100 - 100 / (1 + rs)).fillna(50)
+
+
+INDICATORS = {
+    'Returns': lambda df: df['Close'].pct_change().fillna(0),
+    'SMA_20': lambda df: df['Close'].rolling(20, min_periods=1).mean(),
+    'EMA_12': lambda df: df['Close'].ewm(span=12, adjust=False).mean(),
+    'RSI_14': lambda df: _rsi(df['Close']),
+    'MACD': lambda df: (df['Close'].ewm(span=12, adjust=False).mean()
+                        - df['Close'].ewm(span=26, adjust=False).mean()),
+}
+
+
+def resolve_features(features=None):
+    """Проверяет набор признаков и гарантирует наличие целевой колонки."""
+    features = list(features or DEFAULT_FEATURES)
+    known = set(OHLCV_FEATURES) | set(INDICATORS) | {SENTIMENT_FEATURE}
+    unknown = [f for f in features if f not in known]
+    if unknown:
+        raise ValueError(f"Неизвестные признаки: {unknown}")
+    if TARGET_COLUMN not in features:
+        features.insert(0, TARGET_COLUMN)
+    return features
+
+
+def build_feature_frame(df, features, sentiment=0.0):
+    """Рассчитывает признаки по DataFrame свечей (векторно, без циклов по строкам)."""
+    frame = pd.DataFrame(index=df.index)
+    for name in features:
+        if name in INDICATORS:
+            frame[name] = INDICATORS[name](df)
+        elif name == SENTIMENT_FEATURE:
+            frame[name] = sentiment
+        else:
+            frame[name] = df[name]
+    return frame.ffill().fillna(0)
+
+
+def inverse_target(scaler, values, target_index):
+    """Обратное масштабирование только для целевой колонки."""
+    values = np.asarray(values, dtype=np.float64)
+    return (values - scaler.min_[target_index]) / scaler.scale_[target_index]
+
+
+class FeatureMatrix:
+    def __init__(self, dates, values, scaler, features):
+        self.dates = dates
+        self.values = values
+        self.scaler = scaler
+        self.features = features
+
+    @property
+    def target_index(self):
+        return self.features.index(TARGET_COLUMN)
+
+
+class FeatureStore:
+    """Кэш матриц признаков (float32) и масштабировщиков для каждого символа.
+
+    При повторном запуске пересчитываются только новые свечи, а масштабировщик
+    дообучается через partial_fit вместо полного fit по всей истории.
+    """
+
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _base_path(self, symbol, features):
+        key = hashlib.md5(','.join(features).encode()).hexdigest()[:10]
+        safe_symbol = re.sub(r'[^\w\-]', '_', symbol)
+        return os.path.join(self.cache_dir, f"{safe_symbol}_{key}")
+
+    def _load(self, base_path):
+        try:
+            with np.load(base_path + '.npz') as cached:
+                timestamps, values = cached['timestamps'], cached['values']
+            scaler = joblib.load(base_path + '.scaler.joblib')
+            return timestamps, values, scaler
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, base_path, timestamps, values, scaler):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        np.savez(base_path + '.npz', timestamps=timestamps, values=values)
+        joblib.dump(scaler, base_path + '.scaler.joblib')
+
+    def get_matrix(self, symbol, df, features=None, sentiment=0.0):
+        """Возвращает матрицу признаков для символа, используя кэш где возможно."""
+        features = resolve_features(features)
+        base_path = self._base_path(symbol, features)
+        timestamps = df['Date'].values.astype('datetime64[ns]').astype(np.int64)
+
+        # Последняя закэшированная свеча могла быть незакрытой — пересчитываем её
+        keep = 0
+        cached = self._load(base_path)
+        if cached is not None:
+            cached_ts, cached_values, scaler = cached
+            overlap = min(len(cached_ts), len(timestamps))
+            matches = cached_ts[:overlap] == timestamps[:overlap]
+            keep = int(np.argmin(matches)) if not matches.all() else overlap
+            keep = max(keep - 1, 0)
+
+        if keep == 0:
+            frame = build_feature_frame(df, features, sentiment)
+            values = frame.to_numpy(dtype=np.float32)
+            scaler = MinMaxScaler(feature_range=(0, 1)).fit(values)
+            logger.info(f"Матрица признаков для {symbol} рассчитана заново: {values.shape}")
+        else:
+            start = max(keep - INDICATOR_WARMUP, 0)
+            frame = build_feature_frame(df.iloc[start:], features, sentiment)
+            new_values = frame.to_numpy(dtype=np.float32)[keep - start:]
+            values = np.concatenate([cached_values[:keep], new_values])
+            if len(new_values):
+                scaler.partial_fit(new_values)
+            logger.info(f"Матрица признаков для {symbol} из кэша: {keep} строк, новых {len(new_values)}")
+
+        self._save(base_path, timestamps, values, scaler)
+        return FeatureMatrix(timestamps, values, scaler, features)
+
+
+# Общий кэш признаков
+feature_store = FeatureStore()
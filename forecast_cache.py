@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# forecast_cache импортируется и из пакета сервиса (через analysis), и как модуль верхнего уровня (CLI)
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Ключи Config, от которых зависит модель; при их изменении прогнозы устаревают
+REGISTRY_KEYS = ('lstm_models', 'lstm_hyperparams', 'forecast_backend', 'forecast_backends', 'lstm_features')
+# Ключи со значениями по символам: устаревают только прогнозы изменившихся символов
+PER_SYMBOL_KEYS = ('lstm_models', 'lstm_hyperparams', 'forecast_backends')
+
+
+def model_version(config, symbol, backend, features, look_back):
+    """Короткий хэш всего, что определяет модель символа (бэкенд, признаки, веса LSTM)."""
+    parts = [backend, list(features), look_back]
+    if backend == 'lstm':
+        path = config.get('lstm_models', {}).get(symbol)
+        mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+        parts += [path, mtime, config.get('lstm_hyperparams', {}).get(symbol)]
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:12]
+
+
+class ForecastCache:
+    """Кэш результатов perform_full_analysis в памяти процесса.
+
+    Ключ — (символ, время последней свечи, версия модели, горизонт): пока
+    новая дневная свеча не пришла и модель не менялась, почасовой анализ
+    берёт прогноз отсюда. Записи символа сбрасываются при изменении реестра
+    моделей в Config.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._subscribed = False
+
+    @staticmethod
+    def key(symbol, last_candle, version, horizon):
+        return (symbol, str(last_candle), version, horizon)
+
+    def watch(self, config):
+        """Подписывается на изменения реестра моделей (один раз)."""
+        if not self._subscribed:
+            config.subscribe(self._on_registry_change, keys=REGISTRY_KEYS)
+            self._subscribed = True
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, symbols=None):
+        """Удаляет записи указанных символов (всех, если symbols=None)."""
+        with self.lock:
+            for key in list(self.entries):
+                if symbols is None or key[0] in symbols:
+                    del self.entries[key]
+
+    def _on_registry_change(self, key, old, new):
+        if key in PER_SYMBOL_KEYS:
+            old, new = old or {}, new or {}
+            symbols = {symbol for symbol in set(old) | set(new) if old.get(symbol) != new.get(symbol)}
+            logger.info(f"Реестр моделей изменён ({key}), сброс прогнозов: {', '.join(sorted(symbols))}")
+            self.invalidate(symbols)
+        else:
+            logger.info(f"Изменена настройка {key}, сброс всех прогнозов")
+            self.invalidate()
+
+
+# Общий кэш прогнозов
+forecast_cache = ForecastCache()
+metrics.register_cache('forecast', forecast_cache)
@@ -0,0 +1,217 @@
+import logging
+import numpy as np
+from sklearn.linear_model import Ridge
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+BASELINE_BACKEND = 'ridge'
+
+
+def _windows(values, look_back, start, end):
+    """Окна values[i - look_back:i] для i из [start, end), форма (k, look_back, f)."""
+    view = np.lib.stride_tricks.sliding_window_view(values[start - look_back:end - 1], look_back, axis=0)
+    return view.transpose(0, 2, 1)
+
+
+class Forecaster:
+    """Базовый интерфейс прогнозной модели.
+
+    Все методы работают с масштабированной матрицей признаков (n, f) и
+    прогнозируют колонку target_index на шаг вперёд.
+    """
+
+    name = None
+    # Ключи config, которые читает модель; только они входят в ключ кэша бэктеста
+    config_keys = ()
+
+    def __init__(self, symbol, target_index, look_back=60, config=None, persist=True):
+        self.symbol = symbol
+        self.target_index = target_index
+        self.look_back = look_back
+        self.config = config
+        self.persist = persist
+
+    def fit(self, values, train_end):
+        """Обучает модель на целях с индексами [look_back, train_end)."""
+        raise NotImplementedError
+
+    def _predict_windows(self, windows):
+        raise NotImplementedError
+
+    def predict_range(self, values, start, end):
+        """Прогнозы на шаг вперёд для свечей с индексами [start, end)."""
+        return self._predict_windows(_windows(values, self.look_back, start, end))
+
+    def forecast(self, values, steps):
+        """Рекурсивный прогноз на steps свечей вперёд.
+
+        Остальные признаки переносятся с последней свечи, целевая колонка
+        заменяется прогнозом.
+        """
+        last_sequence = np.array(values[-self.look_back:], dtype=np.float32)
+        predictions = []
+        for _ in range(steps):
+            next_pred = float(self._predict_windows(last_sequence[np.newaxis])[0])
+            predictions.append(next_pred)
+            next_row = last_sequence[-1].copy()
+            next_row[self.target_index] = next_pred
+            last_sequence = np.vstack([last_sequence[1:], next_row])
+        return np.array(predictions)
+
+
+class RidgeForecaster(Forecaster):
+    """Гребневая регрессия на развёрнутых окнах лагов (scikit-learn, без TensorFlow)."""
+
+    name = 'ridge'
+
+    def __init__(self, *args, alpha=1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model = Ridge(alpha=alpha)
+
+    def fit(self, values, train_end):
+        windows = _windows(values, self.look_back, self.look_back, train_end)
+        self.model.fit(windows.reshape(len(windows), -1), values[self.look_back:train_end, self.target_index])
+        return self
+
+    def _predict_windows(self, windows):
+        return self.model.predict(windows.reshape(len(windows), -1))
+
+
+def _holt(series, alpha, beta):
+    """Двойное экспоненциальное сглаживание (Хольт), векторно по сетке alpha/beta.
+
+    Возвращает прогнозы на шаг вперёд для каждой точки ряда, а также
+    итоговые уровень и тренд. Для начального тренда нужно минимум две точки.
+    """
+    if len(series) < 2:
+        raise ValueError(f"Для сглаживания Хольта нужно минимум 2 точки ряда, получено {len(series)}")
+    alpha = np.asarray(alpha, dtype=np.float64)
+    beta = np.asarray(beta, dtype=np.float64)
+    level = np.full(alpha.shape, series[0], dtype=np.float64)
+    trend = np.full(alpha.shape, series[1] - series[0], dtype=np.float64)
+    predictions = np.empty((len(series),) + alpha.shape)
+    predictions[0] = series[0]
+    for i in range(1, len(series)):
+        predictions[i] = level + trend
+        new_level = alpha * series[i] + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+    return predictions, level, trend
+
+
+class ExpSmoothingForecaster(Forecaster):
+    """Экспоненциальное сглаживание Хольта по целевой колонке (чистый NumPy)."""
+
+    name = 'ets'
+
+    ALPHAS = np.linspace(0.1, 0.9, 9)
+    BETAS = np.array([0.01, 0.05, 0.1, 0.2])
+
+    def fit(self, values, train_end):
+        # Параметры подбираются по ошибке на обучающей части одним проходом по сетке
+        alpha, beta = np.meshgrid(self.ALPHAS, self.BETAS)
+        series = values[:train_end, self.target_index].astype(np.float64)
+        predictions, _, _ = _holt(series, alpha, beta)
+        # На коротком ряду разгон сокращается, чтобы ошибка считалась хотя бы по одной точке
+        warmup = min(self.look_back, len(series) - 1)
+        errors = ((predictions[warmup:] - series[warmup:, None, None]) ** 2).mean(axis=0)
+        best = np.unravel_index(np.argmin(errors), errors.shape)
+        self.alpha, self.beta = float(alpha[best]), float(beta[best])
+        logger.info(f"Сглаживание Хольта для {self.symbol}: alpha={self.alpha:.2f}, beta={self.beta:.2f}")
+        return self
+
+    def predict_range(self, values, start, end):
+        predictions, _, _ = _holt(values[:end, self.target_index].astype(np.float64), self.alpha, self.beta)
+        return predictions[start:end]
+
+    def forecast(self, values, steps):
+        _, level, trend = _holt(values[:, self.target_index].astype(np.float64), self.alpha, self.beta)
+        return level + trend * np.arange(1, steps + 1)
+
+
+class LSTMForecaster(Forecaster):
+    """LSTM модель на TensorFlow; TensorFlow импортируется только при использовании."""
+
+    name = 'lstm'
+    config_keys = ('lstm_batch_size', 'tf_intra_op_threads', 'tf_inter_op_threads',
+                   'lstm_max_epochs', 'lstm_patience', 'lstm_time_budget', 'lstm_search_ttl')
+
+    def fit(self, values, train_end):
+        try:
+            from .analysis import build_lstm_model
+            from .training import make_window_dataset, configure_threading, TrainingController, DEFAULT_BATCH_SIZE
+        except ImportError:
+            from analysis import build_lstm_model
+            from training import make_window_dataset, configure_threading, TrainingController, DEFAULT_BATCH_SIZE
+
+        config = self.config
+        val_start = train_end - int((train_end - self.look_back) * 0.1)
+        self.batch_size = config.get('lstm_batch_size', DEFAULT_BATCH_SIZE)
+        configure_threading(config.get('tf_intra_op_threads', 0), config.get('tf_inter_op_threads', 0))
+
+        train_ds = make_window_dataset(values, self.look_back, self.target_index, self.look_back, val_start,
+                                       batch_size=self.batch_size, shuffle=True)
+        val_ds = make_window_dataset(values, self.look_back, self.target_index, val_start, train_end,
+                                     batch_size=self.batch_size)
+
+        controller = TrainingController(
+            build_lstm_model, config,
+            max_epochs=config.get('lstm_max_epochs', 50),
+            patience=config.get('lstm_patience', 5),
+            time_budget=config.get('lstm_time_budget', 300),
+            search_ttl=config.get('lstm_search_ttl', 7 * 24 * 3600),
+            persist=self.persist
+        )
+        self.model, _ = controller.train(self.symbol, train_ds, val_ds,
+                                         (self.look_back, values.shape[1]),
+                                         num_samples=val_start - self.look_back)
+        return self
+
+    def predict_range(self, values, start, end):
+        try:
+            from .training import make_window_dataset
+        except ImportError:
+            from training import make_window_dataset
+
+        dataset = make_window_dataset(values, self.look_back, self.target_index, start, end,
+                                      batch_size=self.batch_size)
+        return self.model.predict(dataset, verbose=0).ravel()
+
+    def _predict_windows(self, windows):
+        # Прямой вызов модели заметно быстрее model.predict для одиночных окон
+        return self.model(windows.astype(np.float32), training=False).numpy().ravel()
+
+
+FORECASTERS = {
+    RidgeForecaster.name: RidgeForecaster,
+    ExpSmoothingForecaster.name: ExpSmoothingForecaster,
+    LSTMForecaster.name: LSTMForecaster,
+}
+
+
+def _forecaster_class(name):
+    if name not in FORECASTERS:
+        raise ValueError(f"Неизвестный бэкенд прогноза: {name}. Доступны: {', '.join(FORECASTERS)}")
+    return FORECASTERS[name]
+
+
+def get_forecaster(name, symbol, target_index, look_back=60, config=None, persist=True):
+    """Создаёт прогнозную модель по имени бэкенда.
+
+    persist=False отключает сохранение состояния между запусками (для бэктеста).
+    """
+    return _forecaster_class(name)(symbol, target_index, look_back=look_back, config=config, persist=persist)
+
+
+def backend_settings(name, config):
+    """Часть config, которую читает бэкенд name."""
+    keys = _forecaster_class(name).config_keys
+    return {key: config[key] for key in keys if key in (config or {})}
+
+
+def resolve_backend(config, symbol, backend=None):
+    """Бэкенд для символа: явно заданный, из Config['forecast_backends'] или по умолчанию."""
+    if backend:
+        return backend
+    return config.get('forecast_backends', {}).get(symbol, config.get('forecast_backend', BASELINE_BACKEND))
@@ -0,0 +1,179 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# http_client is imported both from the package and as a top-level module (analysis, news)
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without a request while the host's circuit is open."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_timeout one
+    trial request is let through (half-open) and its outcome closes or reopens it."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class HTTPClient:
+    """Shared HTTP layer: one pooled session, retries with exponential backoff,
+    a circuit breaker per host and coalescing of identical concurrent GETs."""
+
+    def __init__(self, pool_size=20, retries=3, backoff=0.5, max_backoff=30,
+                 failure_threshold=5, reset_timeout=60):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        # Keep-alive connections are pooled per host
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.breakers = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(self, method, url, retries=None, **kwargs):
+        """Sends a request; returns the Response (including 4xx) or raises.
+
+        Connection errors, timeouts and 429/5xx responses are retried. While a
+        host's circuit is open, CircuitOpenError is raised immediately.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault('timeout', 15)
+
+        response = error = None
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                # Opened by this request's own failures: report what actually went wrong
+                if error is not None:
+                    raise error
+                if response is not None:
+                    return response
+                raise CircuitOpenError(f"Circuit open for {host}, request to {url} skipped")
+            response = error = None
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            metrics.observe(f"http.{host}", time.perf_counter() - start, failed)
+
+            if not failed:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt == retries:
+                if error is not None:
+                    raise error
+                return response
+            delay = self._delay(attempt, response)
+            logger.warning(f"{method} {host} failed ({error or response.status_code}), "
+                           f"retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get(self, url, params=None, **kwargs):
+        """GET; concurrent identical requests share one round-trip and one Response."""
+        if kwargs.get('stream'):
+            return self.request('GET', url, params=params, **kwargs)
+
+        prepared_url = requests.Request('GET', url, params=params).prepare().url
+        key = (prepared_url, repr(sorted((kwargs.get('headers') or {}).items())))
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            response = self.request('GET', url, params=params, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def post(self, url, retries=1, **kwargs):
+        # POSTs are not idempotent (and LLM calls are billed): one retry by default
+        return self.request('POST', url, retries=retries, **kwargs)
+
+    def status(self):
+        return {host: breaker.state for host, breaker in self.breakers.items()}
+
+
+# Process-wide client
+http_client = HTTPClient()
@@ -0,0 +1,195 @@
+import json
+import time
+import bisect
+import functools
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds: from SQLite calls up to full LSTM analyses
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRIC_PREFIX = 'cryptomaster'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, value, error=False):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Latency histograms, error counts and cache hit ratios per operation."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.caches = {}
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def observe(self, op, seconds, error=False):
+        with self.lock:
+            histogram = self.histograms.get(op)
+            if histogram is None:
+                histogram = self.histograms[op] = Histogram()
+            histogram.observe(seconds, error)
+
+    def register_cache(self, name, cache):
+        # cache must expose .hits and .misses counters (see utils.DataCache)
+        self.caches[name] = cache
+
+    def add_route(self, path, handler):
+        # handler(params) -> (body, content_type); served next to /metrics and /stats
+        self.routes[path] = handler
+
+    def timer(self, op):
+        return _Timer(self, op)
+
+    def snapshot(self):
+        with self.lock:
+            ops = {
+                op: {
+                    'count': h.count,
+                    'errors': h.errors,
+                    'error_rate': h.errors / h.count if h.count else 0.0,
+                    'mean': h.sum / h.count if h.count else 0.0,
+                    'p50': h.quantile(0.5),
+                    'p95': h.quantile(0.95),
+                    'p99': h.quantile(0.99),
+                }
+                for op, h in self.histograms.items()
+            }
+        caches = {}
+        for name, cache in self.caches.items():
+            total = cache.hits + cache.misses
+            caches[name] = {'hits': cache.hits, 'misses': cache.misses,
+                            'hit_ratio': cache.hits / total if total else 0.0}
+        return {'operations': ops, 'caches': caches}
+
+    def render_prometheus(self):
+        lines = [f"# TYPE {METRIC_PREFIX}_latency_seconds histogram"]
+        errors = [f"# TYPE {METRIC_PREFIX}_errors_total counter"]
+        with self.lock:
+            for op, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{METRIC_PREFIX}_latency_seconds_bucket{{op="{op}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_latency_seconds_sum{{op="{op}"}} {h.sum}')
+                lines.append(f'{METRIC_PREFIX}_latency_seconds_count{{op="{op}"}} {h.count}')
+                errors.append(f'{METRIC_PREFIX}_errors_total{{op="{op}"}} {h.errors}')
+        lines.extend(errors)
+        lines.append(f"# TYPE {METRIC_PREFIX}_cache_requests_total counter")
+        for name, cache in sorted(self.caches.items()):
+            lines.append(f'{METRIC_PREFIX}_cache_requests_total{{cache="{name}",result="hit"}} {cache.hits}')
+            lines.append(f'{METRIC_PREFIX}_cache_requests_total{{cache="{name}",result="miss"}} {cache.misses}')
+        return '\n'.join(lines) + '\n'
+
+    def start_http_server(self, port, host='127.0.0.1'):
+        """Serves /metrics (Prometheus text format), /stats (JSON) and added routes from a daemon thread."""
+        if self.server:
+            return self.server
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == '/metrics':
+                    body, content_type = registry.render_prometheus(), 'text/plain; version=0.0.4'
+                elif url.path == '/stats':
+                    body, content_type = json.dumps(registry.snapshot()), 'application/json'
+                elif url.path in registry.routes:
+                    try:
+                        body, content_type = registry.routes[url.path](dict(parse_qsl(url.query)))
+                    except Exception as e:
+                        self.send_error(409 if isinstance(e, RuntimeError) else 500, str(e))
+                        return
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+        return self.server
+
+
+class _Timer:
+    def __init__(self, registry, op):
+        self.registry = registry
+        self.op = op
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.op, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+
+class StageTimer:
+    """Records consecutive pipeline stages: each mark() closes the stage since the previous mark."""
+
+    def __init__(self, prefix, registry=None):
+        self.prefix = prefix
+        self.registry = registry or metrics
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.registry.observe(f"{self.prefix}.{stage}", now - self.last)
+        self.last = now
+
+
+def timed(op, none_is_error=False):
+    """Decorator recording latency and errors. none_is_error counts a None result
+    as a failure, for functions that log and swallow their own exceptions."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = none_is_error and result is None
+                return result
+            finally:
+                metrics.observe(op, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
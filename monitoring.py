@@ -1,11 +1,16 @@
-import time
-import threading
 import pandas as pd
-from datetime import datetime
 from .config import Config
-from .database import get_active_alerts, save_whale_transaction
-from .api import get_crypto_price, get_whale_transactions
-from .analysis import perform_full_analysis
+from .database import (get_active_alerts, save_whale_transaction, get_known_whale_hashes, prune_candles,
+                       prune_ai_responses)
+from .api import get_crypto_prices, get_whale_transactions, fetch_prices, sync_candles
+from .analysis import perform_full_analysis, build_report
+from .delivery import ChartDelivery
+from .dispatcher import get_dispatcher
+from .scheduler import JobScheduler
+from .metrics import metrics
+from .profiler import profiler, memory_tracker, register_routes, install_signal_handlers
+from .price_board import PriceBoard, set_board
+from .whale_analytics import get_whale_analytics
 from .utils import log_error
 
 
@@ -13,49 +18,97 @@ class MonitoringService:
     def __init__(self, bot):
         self.bot = bot
         self.running = False
-        self.thread = None
+        self.scheduler = None
+        self.price_board = None
         self.config = Config()
+        self.chart_delivery = ChartDelivery(bot)
+        self.dispatcher = get_dispatcher(bot)
 
     def start(self):
         if self.running:
             return
         self.running = True
-        self.thread = threading.Thread(target=self._monitor, daemon=True)
-        self.thread.start()
+        port = self.config.get('metrics_port')
+        if port:
+            try:
+                register_routes(metrics, profiler, memory_tracker)
+                metrics.start_http_server(port)
+            except OSError as e:
+                log_error("METRICS", f"Endpoint on port {port} not started: {e}")
+        # kill -USR1 <pid>: profile all threads; kill -USR2 <pid>: memory growth report
+        install_signal_handlers(profiler, memory_tracker, self.config.get('profile_seconds', 30))
+        if self.config.get('price_board', True):
+            try:
+                # This process feeds prices to every other process on the machine
+                self.price_board = PriceBoard.create(capacity=self.config.get('price_board_capacity', 1024))
+                set_board(self.price_board)
+            except OSError as e:
+                log_error("PRICE_BOARD", f"Shared price board not created: {e}")
+        self.scheduler = self._build_scheduler()
+        self.scheduler.start()
+        self.config.subscribe(self._on_interval_change, keys=('alert_check_interval', 'whale_check_interval'))
+        if self.price_board:
+            self.scheduler.run_now('price_feed')
+        self.scheduler.run_now('alerts')
+        self.scheduler.run_now('whales')
         log_error("MONITORING", "Service started")
 
     def stop(self):
         self.running = False
-        if self.thread:
-            self.thread.join()
+        self.config.unsubscribe(self._on_interval_change)
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.price_board:
+            set_board(None)
+            self.price_board.close()
+            self.price_board = None
         log_error("MONITORING", "Service stopped")
 
-    def _monitor(self):
-        while self.running:
-            try:
-                # 1. Check alerts
-                self._check_alerts()
+    def _build_scheduler(self):
+        # Every job runs on its own worker, so a slow whale sweep cannot delay alert checks
+        scheduler = JobScheduler(on_error=lambda job, e: log_error("MONITORING", f"Job {job} error: {e}"))
+        scheduler.add_job('alerts', self._check_alerts,
+                          every=self.config.get('alert_check_interval', 60), jitter=5, deadline=55)
+        scheduler.add_job('whales', self._detect_whale_activity,
+                          every=self.config.get('whale_check_interval', 60), jitter=10, deadline=300)
+        scheduler.add_job('hourly_analysis', self._hourly_analysis, at=':00', deadline=3300)
+        if self.price_board:
+            scheduler.add_job('price_feed', self._feed_prices,
+                              every=self.config.get('price_feed_interval', 10), deadline=30)
+        scheduler.add_job('candle_sync', self._sync_candles, every=900, jitter=60, deadline=900)
+        scheduler.add_job('candle_retention', self._prune_candles, every=86400, jitter=600, deadline=3600)
+        scheduler.add_job('ai_cache_retention', self._prune_ai_responses, every=3600, jitter=300, deadline=3600)
+        return scheduler
 
-                # 2. Check whale activity
-                self._detect_whale_activity()
+    def _on_interval_change(self, key, old, new):
+        # Interval changes apply without a restart
+        if self.scheduler:
+            job, jitter = ('alerts', 5) if key == 'alert_check_interval' else ('whales', 10)
+            self.scheduler.reschedule(job, every=new, jitter=jitter)
 
-                # 3. Hourly analysis
-                if datetime.now().minute == 0:
-                    self._hourly_analysis()
-
-                time.sleep(60)
-            except Exception as e:
-                log_error("MONITORING", f"Error: {e}")
-                time.sleep(120)
+    def _feed_prices(self):
+        # Alert currencies and favourite pairs, all fetched with one request
+        symbols = set(self.config.get('favorite_pairs', []))
+        alerts = get_active_alerts()
+        if not alerts.empty:
+            symbols.update(alerts['currency'].unique())
+        for symbol, price_data in fetch_prices(sorted(symbols)).items():
+            try:
+                self.price_board.publish(symbol, price_data)
+            except (ValueError, RuntimeError) as e:
+                # Oversized symbol or full board: readers fall back to the API for it, the rest are still fed
+                log_error("PRICE_BOARD", str(e))
 
     def _check_alerts(self):
         alerts = get_active_alerts()
         if alerts.empty:
             return
 
+        # All alert currencies are priced together before the loop
+        prices = get_crypto_prices(list(alerts['currency'].unique()))
         for _, alert in alerts.iterrows():
             try:
-                price_data = get_crypto_price(alert['currency'])
+                price_data = prices.get(alert['currency'])
                 if not price_data:
                     continue
 
@@ -65,56 +118,80 @@ class MonitoringService:
                 log_error("ALERT_CHECK", f"Error: {e}")
 
     def _detect_whale_activity(self):
+        analytics = get_whale_analytics()
         monitored = self.config.get('monitored_currencies', {})
-        for currencies in monitored.values():
-            for currency in currencies:
-                try:
-                    transactions = get_whale_transactions(currency)
-                    for tx in transactions:
-                        if float(tx['value']) > self.config['whale_threshold']:
-                            self._notify_whale_transaction(tx)
-                            save_whale_transaction((
-                                currency, float(tx['value']), float(tx['valueUSD']),
-                                tx['from'], tx['to'], tx.get('direction', 'UNKNOWN'),
-                                tx.get('chain', 'UNKNOWN'), tx['hash'],
-                                int(tx['timeStamp']), 0.0
-                            ))
-                except Exception as e:
-                    log_error("WHALE_DETECT", f"Currency {currency} error: {e}")
-
-    def _notify_whale_transaction(self, tx):
+        for currency in {c for currencies in monitored.values() for c in currencies}:
+            try:
+                transactions = [tx for tx in get_whale_transactions(currency)
+                                if float(tx['value']) > self.config['whale_threshold']]
+                # The API returns the latest transfers every sweep; only new ones are rated and announced
+                known = get_known_whale_hashes(tx['hash'] for tx in transactions)
+                for tx in transactions:
+                    if tx['hash'] in known:
+                        continue
+                    known.add(tx['hash'])
+                    direction, rating = analytics.add(currency, float(tx['valueUSD']), tx['from'],
+                                                      tx['to'], int(tx['timeStamp']))
+                    save_whale_transaction((
+                        currency, float(tx['value']), float(tx['valueUSD']),
+                        tx['from'].lower(), tx['to'].lower(), direction,
+                        tx.get('chain', 'UNKNOWN'), tx['hash'],
+                        int(tx['timeStamp']), rating
+                    ))
+                    self._notify_whale_transaction(tx, direction, rating, analytics.flows(currency, [24])[24])
+            except Exception as e:
+                log_error("WHALE_DETECT", f"Currency {currency} error: {e}")
+
+    def _notify_whale_transaction(self, tx, direction, rating, flow):
         message = (
             f"🐳 **WHALE ALERT!**\n\n"
             f"**Currency:** {tx['tokenSymbol']}\n"
             f"**Amount:** ${float(tx['valueUSD']):,.2f}\n"
             f"**From:** {tx['from'][:10]}...\n"
             f"**To:** {tx['to'][:10]}...\n"
-            f"**Chain:** {tx.get('chain', 'UNKNOWN')}"
+            f"**Chain:** {tx.get('chain', 'UNKNOWN')}\n"
+            f"**Direction:** {direction}\n"
+            f"**Whale rating:** {rating:.0f}/100\n"
+            f"**Net exchange flow 24h:** ${flow['net']:+,.0f}"
         )
 
-        subscribers = self.config['subscribers']
-        for user_id in subscribers:
+        # Queued per chat; several whale events within the coalesce window become one digest
+        self.dispatcher.broadcast(self.config['subscribers'], message, coalesce_key='whale')
+
+    def _sync_candles(self):
+        # Exchange pairs among favourites and monitored currencies (Yahoo tickers like BTC-USD are skipped)
+        symbols = set(self.config.get('favorite_pairs', []))
+        for currencies in self.config.get('monitored_currencies', {}).values():
+            symbols.update(currencies)
+        for symbol in sorted(s for s in symbols if '/' in s):
             try:
-                self.bot.send_message(user_id, message, parse_mode='Markdown')
+                sync_candles(symbol, days=self.config.get('candle_sync_days', 365))
             except Exception as e:
-                log_error("WHALE_NOTIFY", f"Error: {e}")
+                log_error("CANDLE_SYNC", f"{symbol} error: {e}")
+
+    def _prune_candles(self):
+        removed = prune_candles(self.config.get('candle_retention_days'))
+        if removed:
+            log_error("RETENTION", f"Removed {removed} expired candles")
+
+    def _prune_ai_responses(self):
+        # Expired answers are never served again, so they only take up space
+        removed = prune_ai_responses(self.config.get('ai_cache_ttl', 900))
+        if removed:
+            log_error("RETENTION", f"Removed {removed} expired AI responses")
 
     def _hourly_analysis(self):
+        # Each currency is analysed once, however many chats watch it
+        chats_by_currency = {}
         monitored = self.config.get('monitored_currencies', {})
         for chat_id_str, currencies in monitored.items():
-            chat_id = int(chat_id_str)
             for currency in currencies:
-                try:
-                    chart_path, report = perform_full_analysis(currency)
-                    if chart_path and report:
-                        with open(chart_path, 'rb') as chart_file:
-                            self.bot.send_photo(
-                                chat_id,
-                                chart_file,
-                                caption=report[:1000],
-                                parse_mode='Markdown'
-                            )
-                        if len(report) > 1000:
-                            self.bot.send_message(chat_id, report[1000:], parse_mode='Markdown')
-                except Exception as e:
-                    log_error("HOURLY_ANALYSIS", f"Currency {currency} error: {e}")
\ No newline at end of file
+                chats_by_currency.setdefault(currency, []).append(int(chat_id_str))
+
+        for currency, chat_ids in chats_by_currency.items():
+            try:
+                result = perform_full_analysis(currency, save_results=False)
+                if result and result['chart_png']:
+                    self.chart_delivery.send_chart(chat_ids, result['chart_png'], build_report(result))
+            except Exception as e:
+                log_error("HOURLY_ANALYSIS", f"Currency {currency} error: {e}")
\ No newline at end of file
@@ -0,0 +1,165 @@
+import re
+import hashlib
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+import numpy as np
+from textblob.en.sentiments import PatternAnalyzer
+
+# news импортируется и из пакета сервиса (через analysis), и как модуль верхнего уровня (CLI)
+try:
+    from .utils import DataCache
+    from .metrics import metrics
+    from .http_client import http_client
+except ImportError:
+    from utils import DataCache
+    from metrics import metrics
+    from http_client import http_client
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# RSS-ленты разбираются C-парсером ElementTree — быстрее, чем html.parser по HTML-странице
+NEWS_SOURCES = {
+    'google_news': "https://news.google.com/rss/search?q={}&hl=en-US&gl=US&ceid=US:en",
+    'bing_news': "https://www.bing.com/news/search?q={}&format=rss",
+}
+
+# Названия монет для поисковых запросов
+COIN_NAMES = {
+    'BTC': 'Bitcoin',
+    'ETH': 'Ethereum',
+    'SOL': 'Solana',
+    'XRP': 'XRP Ripple',
+    'LTC': 'Litecoin',
+    'BCH': 'Bitcoin Cash',
+    'BNB': 'BNB Binance',
+    'ADA': 'Cardano',
+    'DOGE': 'Dogecoin',
+}
+
+
+def news_query(symbol):
+    """Поисковый запрос по символу вида 'BTC-USD' или 'BTC/USDT'."""
+    base = re.split(r'[-/]', symbol)[0].upper()
+    return COIN_NAMES.get(base, f"{base} crypto")
+
+
+def _normalize_title(title):
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', '', title)).strip().lower()
+
+
+def parse_rss_titles(content, limit):
+    """Извлекает заголовки из RSS-ленты."""
+    root = ET.fromstring(content)
+    titles = []
+    for item in root.iter('item'):
+        title = item.findtext('title')
+        if title:
+            titles.append(title)
+            if len(titles) >= limit:
+                break
+    return titles
+
+
+class NewsSentimentService:
+    """Сбор новостей и оценка тональности с кэшированием.
+
+    Источники и запросы опрашиваются параллельно, тональность по запросу
+    кэшируется с TTL, а оценка каждого заголовка — отдельно, поэтому один и
+    тот же заголовок из разных источников и запросов оценивается один раз.
+    """
+
+    def __init__(self, sources=None, ttl=1800, headline_ttl=86400, max_workers=8, timeout=15,
+                 max_queries=1000, max_headlines=20000):
+        self.sources = sources or NEWS_SOURCES
+        # Новые заголовки появляются всё время: кэши ограничены, иначе сервис растёт без предела
+        self.query_cache = DataCache(ttl=ttl, max_size=max_queries)
+        self.headline_cache = DataCache(ttl=headline_ttl, max_size=max_headlines)
+        metrics.register_cache('news_query', self.query_cache)
+        metrics.register_cache('news_headline', self.headline_cache)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='news')
+        self.analyzer = PatternAnalyzer()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _query_lock(self, query):
+        with self._locks_guard:
+            return self._locks.setdefault(query, threading.Lock())
+
+    def _fetch_source(self, name, query, limit):
+        try:
+            url = self.sources[name].format(quote_plus(query))
+            response = http_client.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return parse_rss_titles(response.content, limit)
+        except Exception as e:
+            logger.error(f"Ошибка при сборе новостей из {name} по запросу '{query}': {e}")
+            return []
+
+    def fetch_headlines(self, query, num_articles=20):
+        """Параллельно собирает заголовки из всех источников, без дубликатов."""
+        futures = [self.executor.submit(self._fetch_source, name, query, num_articles) for name in self.sources]
+        headlines = {}
+        for future in futures:
+            for title in future.result():
+                headlines.setdefault(_normalize_title(title), title)
+        return headlines
+
+    def score_headlines(self, normalized_titles):
+        """Оценивает тональность заголовков, пропуская уже оценённые.
+
+        PatternAnalyzer не умеет оценивать пачку: каждый новый заголовок
+        анализируется отдельно, а экономия достигается кэшем по заголовку.
+        """
+        scores = np.empty(len(normalized_titles))
+        for i, title in enumerate(normalized_titles):
+            key = hashlib.md5(title.encode()).hexdigest()
+            score = self.headline_cache.get(key)
+            if score is None:
+                score = self.analyzer.analyze(title).polarity
+                self.headline_cache.set(key, score)
+            scores[i] = score
+        return scores
+
+    def get_sentiment(self, query='Bitcoin', num_articles=20):
+        """Средняя тональность новостей по запросу (из кэша, если он свежий)."""
+        cache_key = (query, num_articles)
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Параллельные анализы с одинаковым запросом ждут один сбор новостей
+        with self._query_lock(query):
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            logger.info(f"Сбор новостей по запросу: {query}")
+            headlines = self.fetch_headlines(query, num_articles)
+            normalized = list(headlines)[:num_articles]
+            scores = self.score_headlines(normalized)
+
+            for i, title in enumerate(normalized[:5]):  # Логируем только первые 5 заголовков
+                logger.info(f"Заголовок {i + 1}: {headlines[title][:60]}... | Тональность: {scores[i]:.2f}")
+
+            avg_sentiment = float(scores.mean()) if len(scores) else 0
+            logger.info(f"Проанализировано {len(scores)} статей, средняя тональность: {avg_sentiment:.2f}")
+            self.query_cache.set(cache_key, avg_sentiment)
+            return avg_sentiment
+
+    def get_sentiments(self, queries, num_articles=20):
+        """Тональность для нескольких запросов, собираемых параллельно."""
+        queries = list(dict.fromkeys(queries))
+        # Отдельный пул: self.executor занят запросами к источникам внутри get_sentiment
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries) or 1)) as executor:
+            futures = {query: executor.submit(self.get_sentiment, query, num_articles) for query in queries}
+            return {query: future.result() for query, future in futures.items()}
+
+
+# Общий сервис новостей
+news_service = NewsSentimentService()
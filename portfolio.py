@@ -0,0 +1,219 @@
+import os
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+# portfolio импортируется и из пакета, и как модуль верхнего уровня (CLI)
+try:
+    from .database import get_close_matrix
+except ImportError:
+    from database import get_close_matrix
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_CACHE_DIR = os.path.join('cache', 'portfolio')
+PERIODS_PER_YEAR = {'15m': 96 * 365, '1h': 24 * 365, '4h': 6 * 365, '1d': 365}
+
+
+def load_close_matrix(symbols, timeframe='1d', since=0, last_close=None):
+    """Цены закрытия символов одним запросом: строки — время, колонки — символы.
+
+    Пропуски заполняются последней ценой (last_close — цены перед since, если
+    известны); строки до появления всех символов отбрасываются. Символы без
+    данных в базе не попадают в матрицу.
+    """
+    symbols = list(symbols)
+    rows = get_close_matrix(symbols, timeframe, since)
+    matrix = rows.pivot(index='timestamp', columns='symbol', values='close').reindex(columns=symbols)
+    if last_close is not None:
+        seed = pd.DataFrame([last_close], columns=symbols, index=[since - 1])
+        matrix = pd.concat([seed, matrix]).ffill().iloc[1:]
+    return matrix.ffill().dropna(axis=1, how='all').dropna()
+
+
+def rolling_correlations(closes, window):
+    """Матрицы корреляции лог-доходностей для каждого окна из window свечей.
+
+    Возвращает массив (окна, N, N); суммы окон берутся разностью кумулятивных
+    сумм, без цикла по времени.
+    """
+    returns = np.diff(np.log(np.asarray(closes, dtype=np.float64)), axis=0)
+    if len(returns) < window:
+        return np.empty((0, returns.shape[1], returns.shape[1]))
+    zeros = np.zeros((1,) + returns.shape[1:])
+    first = np.cumsum(np.concatenate([zeros, returns]), axis=0)
+    second = np.cumsum(np.concatenate([zeros[:, :, None] * zeros[:, None, :],
+                                       returns[:, :, None] * returns[:, None, :]]), axis=0)
+    sums = first[window:] - first[:-window]
+    cross = second[window:] - second[:-window]
+    cov = (cross - sums[:, :, None] * sums[:, None, :] / window) / (window - 1)
+    std = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / (std[:, :, None] * std[:, None, :])
+
+
+def max_drawdowns(closes):
+    """Максимальная просадка каждого символа (доля от пика, отрицательная)."""
+    closes = np.asarray(closes, dtype=np.float64)
+    return (closes / np.maximum.accumulate(closes, axis=0) - 1).min(axis=0)
+
+
+class RollingMoments:
+    """Скользящие суммы доходностей за окно: Σr (N) и Σr·rᵀ (N×N).
+
+    Новая свеча добавляет внешнее произведение своей доходности и вычитает
+    произведение вышедшей из окна — O(N²) вместо пересчёта по всей истории.
+    Доходности окна лежат в кольцевом буфере; на каждом обороте буфера суммы
+    пересчитываются из него заново, чтобы не копилась ошибка округления.
+    """
+
+    def __init__(self, symbols, window):
+        self.symbols = list(symbols)
+        n = len(self.symbols)
+        self.window = window
+        self.buffer = np.zeros((window, n))
+        self.position = 0
+        self.count = 0
+        self.sum = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.last_close = None
+        self.last_timestamp = None
+        self.peak = None
+        self.max_drawdown = np.zeros(n)
+
+    @classmethod
+    def from_closes(cls, symbols, timestamps, closes, window):
+        """Состояние после всей истории, посчитанное векторно."""
+        closes = np.asarray(closes, dtype=np.float64)
+        moments = cls(symbols, window)
+        returns = np.diff(np.log(closes), axis=0)[-window:]
+        moments.count = len(returns)
+        moments.buffer[:moments.count] = returns
+        moments.position = moments.count % window
+        moments.sum = returns.sum(axis=0)
+        moments.cross = returns.T @ returns
+        moments.last_close = closes[-1]
+        moments.last_timestamp = int(timestamps[-1])
+        moments.peak = closes.max(axis=0)
+        moments.max_drawdown = max_drawdowns(closes)
+        return moments
+
+    def push(self, timestamp, close):
+        close = np.asarray(close, dtype=np.float64)
+        if self.last_close is not None:
+            r = np.log(close / self.last_close)
+            if self.count == self.window:
+                old = self.buffer[self.position]
+                self.sum -= old
+                self.cross -= np.outer(old, old)
+            else:
+                self.count += 1
+            self.buffer[self.position] = r
+            self.sum += r
+            self.cross += np.outer(r, r)
+            self.position = (self.position + 1) % self.window
+            if self.position == 0:
+                self.sum = self.buffer.sum(axis=0)
+                self.cross = self.buffer.T @ self.buffer
+        self.peak = close if self.peak is None else np.maximum(self.peak, close)
+        self.max_drawdown = np.minimum(self.max_drawdown, close / self.peak - 1)
+        self.last_close = close
+        self.last_timestamp = int(timestamp)
+
+    def copy(self):
+        moments = RollingMoments(self.symbols, self.window)
+        moments.__dict__.update({key: value.copy() if isinstance(value, np.ndarray) else value
+                                 for key, value in self.__dict__.items()})
+        return moments
+
+    def covariance(self):
+        n = self.count
+        return (self.cross - np.outer(self.sum, self.sum) / n) / (n - 1)
+
+    def stats(self, periods_per_year, benchmark=0):
+        """Корреляции, годовая волатильность, бета к benchmark и максимальная просадка."""
+        cov = self.covariance()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = cov / np.outer(std, std)
+            beta = cov[:, benchmark] / cov[benchmark, benchmark]
+        return {
+            'correlation': pd.DataFrame(correlation, index=self.symbols, columns=self.symbols),
+            'summary': pd.DataFrame({
+                'volatility': std * np.sqrt(periods_per_year),
+                'beta': beta,
+                'max_drawdown': self.max_drawdown,
+            }, index=self.symbols),
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, symbols=np.array(self.symbols), buffer=self.buffer, sum=self.sum, cross=self.cross,
+                 last_close=self.last_close, peak=self.peak, max_drawdown=self.max_drawdown,
+                 scalars=np.array([self.position, self.count, self.last_timestamp], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path) as cached:
+                moments = cls([str(symbol) for symbol in cached['symbols']], cached['buffer'].shape[0])
+                for key in ('buffer', 'sum', 'cross', 'last_close', 'peak', 'max_drawdown'):
+                    setattr(moments, key, cached[key])
+                moments.position, moments.count, moments.last_timestamp = (int(v) for v in cached['scalars'])
+            return moments
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+class PortfolioAnalytics:
+    """Кросс-активная аналитика по свечам из базы с кэшем скользящих сумм.
+
+    В кэше хранится состояние по последнюю закрытую свечу; при следующем
+    запуске из базы читаются только более новые свечи. Последняя (возможно,
+    незакрытая) свеча добавляется к копии состояния и не сохраняется.
+    Просадка считается с начала истории, загруженной при первом запуске.
+    """
+
+    def __init__(self, cache_dir=PORTFOLIO_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, symbols, timeframe, window):
+        key = hashlib.md5(f"{','.join(symbols)}|{timeframe}|{window}".encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def analyze(self, symbols, timeframe='1d', window=30, since=0, benchmark=None):
+        """Возвращает dict со статистикой последнего окна или None, если данных недостаточно."""
+        symbols = list(dict.fromkeys(symbols))
+        path = self._cache_path(symbols, timeframe, window)
+        moments = RollingMoments.load(path)
+
+        if moments is not None:
+            matrix = load_close_matrix(moments.symbols, timeframe, moments.last_timestamp + 1, moments.last_close)
+            if list(matrix.columns) != moments.symbols:
+                moments = None
+            else:
+                logger.info(f"Кэш портфеля {path}: новых свечей {len(matrix)}")
+
+        if moments is None:
+            matrix = load_close_matrix(symbols, timeframe, since)
+            if len(matrix) < window + 2 or matrix.shape[1] < 2:
+                return None
+            moments = RollingMoments.from_closes(list(matrix.columns), matrix.index[:-1],
+                                                 matrix.to_numpy()[:-1], window)
+            matrix = matrix.iloc[-1:]
+
+        for timestamp, closes in zip(matrix.index[:-1], matrix.to_numpy()[:-1]):
+            moments.push(timestamp, closes)
+        moments.save(path)
+        current = moments.copy()
+        if len(matrix):
+            current.push(matrix.index[-1], matrix.to_numpy()[-1])
+
+        symbols = current.symbols
+        benchmark_index = symbols.index(benchmark) if benchmark in symbols else 0
+        result = current.stats(PERIODS_PER_YEAR.get(timeframe, 365), benchmark_index)
+        result.update(symbols=symbols, benchmark=symbols[benchmark_index], window=window,
+                      last_timestamp=current.last_timestamp)
+        return result
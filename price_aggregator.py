@@ -0,0 +1,206 @@
+import time
+import threading
+import statistics
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import ccxt
+from .config import Config
+from .database import log_error
+from .metrics import metrics
+
+DEFAULT_EXCHANGES = ['binance', 'okx', 'bybit', 'kraken', 'kucoin']
+
+
+class AggregatedPriceService:
+    """Consensus ticker from several ccxt exchanges queried concurrently.
+
+    A symbol's price is the quote-volume weighted average of the sources
+    within max_deviation of their median; sources older than max_age or
+    outside that band are dropped. The answer is returned as soon as
+    `quorum` sources agree, so one slow or dead exchange costs nothing
+    but its own worker. Each exchange runs one fetch at a time on its own
+    thread and keeps at most one more queued: concurrent callers share the
+    in-flight fetch when it covers their symbols and otherwise merge theirs
+    into the queued one, so a hung exchange holds one thread, never the
+    healthy exchanges' workers. Composites are cached for the cache's TTL.
+    """
+
+    def __init__(self, exchanges=None, quorum=2, timeout=5, max_age=120, max_deviation=0.02, cache=None):
+        self.exchange_ids = list(exchanges or DEFAULT_EXCHANGES)
+        self.quorum = min(quorum, len(self.exchange_ids))
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_deviation = max_deviation
+        self.cache = cache
+        # Late answers keep running after the quorum returned, on the exchange's own worker
+        self.executors = {exchange_id: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"price-{exchange_id}")
+                          for exchange_id in self.exchange_ids}
+        self._exchanges = {}
+        self._inflight = {}     # exchange_id -> (future, symbols it fetches)
+        self._queued = {}       # exchange_id -> (future, symbols to fetch next), merged until it starts
+        self._guard = threading.Lock()
+
+    def _exchange(self, exchange_id):
+        # Instances are reused so markets are loaded once and connections stay alive
+        with self._guard:
+            exchange = self._exchanges.get(exchange_id)
+            if exchange is None:
+                exchange = self._exchanges[exchange_id] = getattr(ccxt, exchange_id)({'enableRateLimit': True})
+            return exchange
+
+    def _fetch(self, exchange_id, symbols):
+        """{symbol: ticker} for the symbols this exchange lists."""
+        with metrics.timer(f"price.{exchange_id}"):
+            exchange = self._exchange(exchange_id)
+            exchange.load_markets()
+            listed = [symbol for symbol in symbols if symbol in exchange.markets]
+            if len(listed) > 1 and exchange.has.get('fetchTickers'):
+                tickers = exchange.fetch_tickers(listed)
+            else:
+                tickers = {symbol: exchange.fetch_ticker(symbol) for symbol in listed}
+            return {symbol: ticker for symbol, ticker in tickers.items() if symbol in listed}
+
+    def _submit(self, exchange_id, symbols):
+        """Future of the exchange's tickers for the symbols.
+
+        A fetch in flight that covers them is shared; otherwise the symbols
+        join the exchange's queued fetch, which is created if there is none.
+        """
+        with self._guard:
+            future, fetching = self._inflight.get(exchange_id, (None, frozenset()))
+            if future is not None and not future.done() and fetching.issuperset(symbols):
+                return future
+            queued = self._queued.get(exchange_id)
+            if queued is not None:
+                queued[1].update(symbols)
+                return queued[0]
+            future = Future()
+            self._queued[exchange_id] = (future, set(symbols))
+        self.executors[exchange_id].submit(self._run_queued, exchange_id)
+        return future
+
+    def _run_queued(self, exchange_id):
+        with self._guard:
+            future, symbols = self._queued.pop(exchange_id)
+            self._inflight[exchange_id] = (future, frozenset(symbols))
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._fetch(exchange_id, list(symbols)))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _consensus(self, symbol, quotes, now):
+        """Composite price data from {exchange_id: ticker}, or None without a usable source."""
+        fresh, dropped = {}, {}
+        for exchange_id, ticker in quotes.items():
+            if not ticker.get('last'):
+                dropped[exchange_id] = 'no price'
+            elif ticker.get('timestamp') and now - ticker['timestamp'] / 1000 > self.max_age:
+                dropped[exchange_id] = 'stale'
+            else:
+                fresh[exchange_id] = ticker
+        if not fresh:
+            return None
+
+        median = statistics.median(ticker['last'] for ticker in fresh.values())
+        sources = {}
+        for exchange_id, ticker in fresh.items():
+            if abs(ticker['last'] - median) / median > self.max_deviation:
+                dropped[exchange_id] = 'outlier'
+            else:
+                sources[exchange_id] = ticker
+        if not sources:
+            return None
+
+        volumes = {exchange_id: ticker.get('quoteVolume') or 0 for exchange_id, ticker in sources.items()}
+        total_volume = sum(volumes.values())
+        if total_volume:
+            price = sum(ticker['last'] * volumes[exchange_id] for exchange_id, ticker in sources.items()) / total_volume
+        else:
+            price = statistics.fmean(ticker['last'] for ticker in sources.values())
+        prices = [ticker['last'] for ticker in sources.values()]
+        # Range and daily change come from the most liquid venue
+        main = sources[max(sources, key=lambda exchange_id: volumes[exchange_id])]
+        return {
+            'price': price,
+            'high': main.get('high'),
+            'low': main.get('low'),
+            'change': main.get('percentage'),
+            'volume': total_volume,
+            'symbol': symbol,
+            'spread': (max(prices) - min(prices)) / price,
+            'sources': sorted(sources),
+            'dropped': dropped,
+        }
+
+    def _agreeing(self, symbol, quotes, now):
+        composite = self._consensus(symbol, quotes, now)
+        return composite if composite and len(composite['sources']) >= self.quorum else None
+
+    def get_prices(self, symbols, use_cache=True):
+        """{symbol: composite} for the symbols at least one source could price."""
+        symbols = list(dict.fromkeys(symbols))
+        result, missing = {}, []
+        for symbol in symbols:
+            cached = self.cache.get(symbol) if self.cache and use_cache else None
+            if cached:
+                result[symbol] = cached
+            else:
+                missing.append(symbol)
+        if not missing:
+            return result
+
+        # An exchange busy with another caller's fetch is waited on (up to timeout), not re-queried
+        futures = {self._submit(exchange_id, missing): exchange_id for exchange_id in self.exchange_ids}
+        quotes = {symbol: {} for symbol in missing}
+        pending = set(futures)
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            done, pending = wait(pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    tickers = future.result()
+                except Exception as e:
+                    log_error("PRICE", f"{futures[future]} error: {e}")
+                    continue
+                # A shared fetch may cover more symbols than this call asked for
+                for symbol in missing:
+                    if symbol in tickers:
+                        quotes[symbol][futures[future]] = tickers[symbol]
+            now = time.time()
+            if all(self._agreeing(symbol, quotes[symbol], now) for symbol in missing):
+                break
+
+        # Without a quorum the agreeing subset (possibly one exchange) is still better than nothing
+        now = time.time()
+        for symbol in missing:
+            composite = self._consensus(symbol, quotes[symbol], now)
+            if composite is None:
+                continue
+            composite['quorum'] = len(composite['sources']) >= self.quorum
+            result[symbol] = composite
+            if self.cache:
+                self.cache.set(symbol, composite)
+        return result
+
+    def get_price(self, symbol):
+        return self.get_prices([symbol]).get(symbol)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_price_service(cache=None):
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = Config()
+            _service = AggregatedPriceService(exchanges=config.get('price_exchanges', DEFAULT_EXCHANGES),
+                                              quorum=config.get('price_quorum', 2),
+                                              timeout=config.get('price_timeout', 5),
+                                              max_deviation=config.get('price_max_deviation', 0.02),
+                                              cache=cache)
+        return _service
@@ -0,0 +1,257 @@
+import os
+import time
+import struct
+import logging
+import threading
+from multiprocessing import shared_memory, resource_tracker
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = 'cryptomaster-prices'
+DEFAULT_CAPACITY = 1024
+ATTACH_RETRY = 5.0
+MAX_READ_RETRIES = 100
+
+MAGIC = b'CMPB'
+# magic, layout version, capacity, number of assigned slots, feeder pid (0 once the feeder closed it)
+HEADER = struct.Struct('<4sIIIQ')
+# seq, symbol, price, high, low, change, volume, updated_at (72 bytes, 8-aligned)
+SLOT = struct.Struct('<Q16s6d')
+SEQ = struct.Struct('<Q')
+COUNT = struct.Struct('<I')
+COUNT_OFFSET = 12
+PID = struct.Struct('<Q')
+PID_OFFSET = 16
+LAYOUT_VERSION = 2
+SYMBOL_SIZE = 16
+FIELDS = ('price', 'high', 'low', 'change', 'volume')
+
+_tracker_lock = threading.Lock()
+
+
+def _number(value):
+    return float('nan') if value is None else float(value)
+
+
+def _value(number):
+    return None if number != number else number
+
+
+def _open_untracked(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with the resource tracker,
+        # which unlinks it when the reader exits (and the tracker may be the feeder's)
+        with _tracker_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_pid(name):
+    """Pid of the feeder that created an existing board; None if it is not a board of this layout."""
+    shm = _open_untracked(name)
+    try:
+        magic, version, _, _, pid = HEADER.unpack_from(shm.buf, 0)
+    finally:
+        shm.close()
+    return pid if magic == MAGIC and version == LAYOUT_VERSION else None
+
+
+class PriceBoard:
+    """Latest ticker per symbol in a shared memory block.
+
+    One process (the feeder) creates the board and publishes; any number of
+    processes attach by name and read without locks. Each slot is guarded by
+    a sequence counter (seqlock): the writer makes it odd, writes, makes it
+    even again, and a reader retries if it saw an odd or changed counter.
+    The slot index is the symbol id; slots are assigned by the feeder only.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        self.capacity = HEADER.unpack_from(self.buf, 0)[2]
+        self.ids = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def create(cls, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY):
+        size = HEADER.size + capacity * SLOT.size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Only a board whose feeder is gone may be replaced; another live feeder keeps its board
+            pid = _owner_pid(name)
+            if pid is not None and _process_alive(pid):
+                raise FileExistsError(f"Price board {name} is in use by process {pid}")
+            logger.warning(f"Price board {name} left behind by a feeder that did not shut down cleanly, recreating it")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, LAYOUT_VERSION, capacity, 0, os.getpid())
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Opens an existing board for reading; raises FileNotFoundError if there is none."""
+        shm = _open_untracked(name)
+        magic, version = HEADER.unpack_from(shm.buf, 0)[:2]
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            shm.close()
+            raise ValueError(f"{name} is not a price board of layout {LAYOUT_VERSION}")
+        return cls(shm, owner=False)
+
+    def _offset(self, symbol_id):
+        return HEADER.size + symbol_id * SLOT.size
+
+    def live(self):
+        """False once the feeder has closed this board or exited; a new board may have replaced it."""
+        return _process_alive(PID.unpack_from(self.buf, PID_OFFSET)[0])
+
+    @property
+    def count(self):
+        return COUNT.unpack_from(self.buf, COUNT_OFFSET)[0]
+
+    def symbol_id(self, symbol):
+        """Slot of a symbol; None if the feeder has not published it yet."""
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            # New slots are appended: only the ones not seen yet are scanned
+            for index in range(len(self.ids), self.count):
+                name = SLOT.unpack_from(self.buf, self._offset(index))[1].rstrip(b'\0').decode()
+                self.ids[name] = index
+            symbol_id = self.ids.get(symbol)
+        return symbol_id
+
+    def publish(self, symbol, price_data, updated_at=None):
+        """Writes a ticker (the dict returned by api.get_crypto_price). Feeder only.
+
+        Raises ValueError for a symbol longer than 16 bytes in UTF-8, which the slot cannot hold.
+        """
+        encoded = symbol.encode()
+        if len(encoded) > SYMBOL_SIZE:
+            raise ValueError(f"Symbol {symbol!r} does not fit a price board slot ({SYMBOL_SIZE} bytes)")
+        symbol_id = self.symbol_id(symbol)
+        new = symbol_id is None
+        if new:
+            symbol_id = self.count
+            if symbol_id >= self.capacity:
+                raise RuntimeError(f"Price board is full ({self.capacity} symbols)")
+            self.ids[symbol] = symbol_id
+
+        offset = self._offset(symbol_id)
+        seq = SEQ.unpack_from(self.buf, offset)[0]
+        SEQ.pack_into(self.buf, offset, seq + 1)
+        SLOT.pack_into(self.buf, offset, seq + 1, encoded,
+                       *(_number(price_data.get(field)) for field in FIELDS),
+                       updated_at or time.time())
+        SEQ.pack_into(self.buf, offset, seq + 2)
+        if new:
+            # Readers only look at a slot once the count covers it, i.e. after its first write
+            COUNT.pack_into(self.buf, COUNT_OFFSET, symbol_id + 1)
+
+    def read(self, symbol, max_age=None):
+        """Consistent copy of a symbol's ticker, or None if missing or older than max_age seconds."""
+        symbol_id = self.symbol_id(symbol)
+        if symbol_id is None:
+            self.misses += 1
+            return None
+        offset = self._offset(symbol_id)
+        for _ in range(MAX_READ_RETRIES):
+            seq = SEQ.unpack_from(self.buf, offset)[0]
+            if seq & 1:
+                continue
+            values = SLOT.unpack_from(self.buf, offset)
+            if values[0] == seq and SEQ.unpack_from(self.buf, offset)[0] == seq:
+                break
+        else:
+            self.misses += 1
+            return None
+
+        updated_at = values[-1]
+        if max_age is not None and time.time() - updated_at > max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        price_data = {field: _value(number) for field, number in zip(FIELDS, values[2:7])}
+        price_data.update(symbol=symbol, updated_at=updated_at)
+        return price_data
+
+    def close(self):
+        if self.owner:
+            # Readers still mapping this block see it is gone and attach to the next board
+            PID.pack_into(self.buf, PID_OFFSET, 0)
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+_board = None
+_last_attempt = 0.0
+_board_lock = threading.Lock()
+
+
+def _use(board):
+    # Caller holds _board_lock
+    global _board
+    _board = board
+    if board is not None:
+        metrics.register_cache('price_board', board)
+
+
+def get_board(name=DEFAULT_NAME):
+    """The board of this machine's feeder, attached on first use; None while there is no feeder.
+
+    Every ATTACH_RETRY seconds an attached board is checked, and dropped for
+    the current one if its feeder has closed it or exited (e.g. restarted).
+    """
+    global _last_attempt
+    board = _board
+    if board is not None and (board.owner or time.monotonic() - _last_attempt < ATTACH_RETRY):
+        return board
+    with _board_lock:
+        now = time.monotonic()
+        if now - _last_attempt >= ATTACH_RETRY:
+            _last_attempt = now
+            if _board is not None and not _board.owner and not _board.live():
+                # Not closed here: other threads may still be reading it; the mapping goes with the last reference
+                logger.info("Price board feeder is gone, attaching to the current board")
+                _use(None)
+            if _board is None:
+                try:
+                    _use(PriceBoard.attach(name))
+                except (FileNotFoundError, ValueError):
+                    pass
+        return _board
+
+
+def set_board(board):
+    """Makes the feeder's own board the one get_board() returns in its process."""
+    with _board_lock:
+        _use(board)
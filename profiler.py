@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+import collections
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = 'profiles'
+DEFAULT_INTERVAL = 0.01
+MAX_SECONDS = 300
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, thread_name):
+    """Stack as one 'thread;outer;...;inner' line (Brendan Gregg's collapsed format)."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(';', ':'))
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples the stacks of all running threads at a fixed interval.
+
+    Nothing runs between captures; a capture costs one sys._current_frames()
+    walk per interval on a separate thread. Output is the collapsed format
+    read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, output_dir=PROFILE_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.last_path = None
+
+    @property
+    def busy(self):
+        return self.lock.locked()
+
+    def capture(self, seconds, thread_prefixes=None):
+        """Samples for `seconds` and returns a Counter of collapsed stacks.
+
+        thread_prefixes limits sampling to threads whose name starts with one of them.
+        """
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile capture is already running")
+        try:
+            seconds = min(seconds, MAX_SECONDS)
+            own = threading.get_ident()
+            stacks = collections.Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    name = names.get(ident, f"thread-{ident}")
+                    if thread_prefixes and not name.startswith(tuple(thread_prefixes)):
+                        continue
+                    stacks[collapse(frame, name)] += 1
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self.lock.release()
+
+    def write(self, stacks, path=None):
+        if path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w') as f:
+            f.write(render_folded(stacks))
+        self.last_path = path
+        return path
+
+    def capture_to_file(self, seconds, thread_prefixes=None):
+        stacks = self.capture(seconds, thread_prefixes)
+        path = self.write(stacks)
+        logger.info(f"Profile of {seconds}s ({sum(stacks.values())} samples) written to {path}")
+        return path
+
+    def capture_in_background(self, seconds, thread_prefixes=None):
+        if self.busy:
+            logger.warning("Profile capture already running, request ignored")
+            return None
+        thread = threading.Thread(target=self.capture_to_file, args=(seconds, thread_prefixes),
+                                  name='profiler', daemon=True)
+        thread.start()
+        return thread
+
+
+def render_folded(stacks):
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc snapshots, each diffed against the previous one.
+
+    Tracing starts on the first snapshot (which becomes the baseline), so the
+    allocation overhead is only paid once someone asks for it.
+    """
+
+    def __init__(self, frames=5, top=25, output_dir=PROFILE_DIR):
+        self.frames = frames
+        self.top = top
+        self.output_dir = output_dir
+        self.previous = None
+        self.previous_at = None
+        self.lock = threading.Lock()
+
+    def _take(self):
+        snapshot = tracemalloc.take_snapshot()
+        # Allocations made by tracemalloc itself and by imports are noise here
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def snapshot(self):
+        """Returns the report text: top allocation growth since the previous snapshot."""
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self.previous, self.previous_at = self._take(), time.time()
+                return "tracemalloc started; the next snapshot will show growth since now\n"
+
+            current, now = self._take(), time.time()
+            stats = current.compare_to(self.previous, 'traceback')
+            current_mb, peak_mb = (value / 1024 / 1024 for value in tracemalloc.get_traced_memory())
+            lines = [f"Growth over {now - self.previous_at:.0f}s, traced {current_mb:.1f} MB "
+                     f"(peak {peak_mb:.1f} MB)"]
+            for stat in stats[:self.top]:
+                lines.append(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                             f"total {stat.size / 1024:.1f} KiB")
+                lines.extend(f"    {line}" for line in stat.traceback.format())
+            self.previous, self.previous_at = current, now
+            report = '\n'.join(lines) + '\n'
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"memory-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, 'w') as f:
+            f.write(report)
+        logger.info(f"Memory diff written to {path}")
+        return report
+
+    def stop(self):
+        with self.lock:
+            tracemalloc.stop()
+            self.previous = self.previous_at = None
+
+
+def install_signal_handlers(profiler, tracker, seconds=30):
+    """SIGUSR1: profile all threads for `seconds`; SIGUSR2: memory diff.
+
+    Only possible on POSIX and from the main thread; returns False otherwise.
+    """
+    if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.capture_in_background(seconds))
+    signal.signal(signal.SIGUSR2, lambda signum, frame: threading.Thread(
+        target=tracker.snapshot, name='memory-snapshot', daemon=True).start())
+    return True
+
+
+def register_routes(registry, profiler, tracker):
+    """Adds /profile?seconds=N[&threads=job-,dispatcher-] and /memory to the metrics endpoint."""
+    def profile(params):
+        prefixes = [p for p in params.get('threads', '').split(',') if p] or None
+        stacks = profiler.capture(float(params.get('seconds', 10)), prefixes)
+        profiler.write(stacks)
+        return render_folded(stacks), 'text/plain'
+
+    registry.add_route('/profile', profile)
+    registry.add_route('/memory', lambda params: (tracker.snapshot(), 'text/plain'))
+
+
+# Process-wide instances
+profiler = SamplingProfiler()
+memory_tracker = MemoryTracker()
@@ -0,0 +1,109 @@
+import io
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import date2num
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Больше точек на графике шириной 14 дюймов всё равно не различить
+DEFAULT_MAX_POINTS = 1000
+
+
+def lttb(x, y, threshold):
+    """Прореживание ряда алгоритмом Largest-Triangle-Three-Buckets.
+
+    Сохраняет форму графика (пики и провалы) при уменьшении числа точек
+    до threshold. Первая и последняя точки сохраняются всегда.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Границы корзин для внутренних точек
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = end if i + 2 < len(edges) else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Площадь треугольника (prev, кандидат, среднее следующей корзины)
+        areas = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev])
+                       - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+    return x[selected], y[selected]
+
+
+class ChartRenderer:
+    """Потокобезопасная отрисовка графиков прогноза без pyplot.
+
+    Используется объектный API Agg: у каждого потока пула своя заготовка
+    Figure, которая переиспользуется между вызовами (меняются только данные).
+    Длинная история прореживается LTTB до max_points точек.
+    """
+
+    def __init__(self, max_workers=2, max_points=DEFAULT_MAX_POINTS, figsize=(14, 6), dpi=100):
+        self.max_points = max_points
+        self.figsize = figsize
+        self.dpi = dpi
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render')
+        self._local = threading.local()
+
+    def _forecast_template(self):
+        template = getattr(self._local, 'forecast', None)
+        if template is None:
+            figure = Figure(figsize=self.figsize, dpi=self.dpi)
+            FigureCanvasAgg(figure)
+            ax = figure.add_subplot()
+            history_line, = ax.plot([], [], label='Исторические данные')
+            forecast_line, = ax.plot([], [], 'ro-', label='Прогноз')
+            ax.xaxis_date()
+            ax.set_xlabel('Дата')
+            ax.set_ylabel('Цена (USD)')
+            ax.legend()
+            ax.grid(True)
+            template = self._local.forecast = (figure, ax, history_line, forecast_line)
+        return template
+
+    def render_forecast(self, symbol, dates, prices, forecast_dates, forecast_prices, path=None):
+        """Рисует историю и прогноз. Возвращает путь к PNG или байты, если path не задан."""
+        figure, ax, history_line, forecast_line = self._forecast_template()
+
+        x = date2num(pd.to_datetime(pd.Series(dates)).dt.to_pydatetime())
+        x, y = lttb(x, prices, self.max_points)
+        history_line.set_data(x, y)
+        forecast_line.set_data(date2num(pd.to_datetime(pd.Series(forecast_dates)).dt.to_pydatetime()),
+                               np.asarray(forecast_prices, dtype=np.float64).ravel())
+        ax.set_title(f'Прогноз цен на {symbol}')
+        ax.relim()
+        ax.autoscale_view()
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            figure.savefig(path, format='png')
+            return path
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+
+    def submit_forecast(self, *args, **kwargs):
+        """Ставит отрисовку в пул; возвращает Future с путём или байтами PNG."""
+        return self.executor.submit(self.render_forecast, *args, **kwargs)
+
+
+# Общий пул отрисовки
+chart_renderer = ChartRenderer()
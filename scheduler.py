@@ -0,0 +1,138 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import schedule
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    def __init__(self, name, func, deadline=None):
+        self.name = name
+        self.func = func
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"job-{name}")
+        self.running = threading.Event()
+        self.started_at = None
+        self.last_duration = None
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.overrun_reported = False
+
+
+class JobScheduler:
+    """Runs each job on its own cadence and its own worker thread.
+
+    A tick is skipped while the previous run of the same job is still going,
+    so a slow job never piles up or delays the others. Runs longer than the
+    job's deadline are reported through on_error. Jobs may be added or
+    rescheduled from any thread.
+    """
+
+    def __init__(self, on_error=None, tick=1.0):
+        self.scheduler = schedule.Scheduler()
+        self.jobs = {}
+        self.on_error = on_error or (lambda name, error: logger.error(f"Job {name} failed: {error}"))
+        self.tick = tick
+        self.running = False
+        self.thread = None
+        # schedule.Scheduler is not thread-safe: the loop and reschedule() share this lock
+        self._lock = threading.Lock()
+
+    def add_job(self, name, func, every=None, jitter=0, at=None, deadline=None):
+        """Registers a job.
+
+        every/jitter: run every `every` to `every + jitter` seconds (random per run).
+        at: run hourly at the given minute, e.g. ':00'.
+        deadline: seconds a single run may take before it is reported as an overrun.
+        """
+        job = ScheduledJob(name, func, deadline)
+        with self._lock:
+            self.jobs[name] = job
+            self._schedule(job, every, jitter, at)
+        return job
+
+    def _schedule(self, job, every, jitter, at):
+        if at is not None:
+            self.scheduler.every().hour.at(at).do(self._trigger, job).tag(job.name)
+        elif jitter:
+            self.scheduler.every(every).to(every + jitter).seconds.do(self._trigger, job).tag(job.name)
+        else:
+            self.scheduler.every(every).seconds.do(self._trigger, job).tag(job.name)
+
+    def reschedule(self, name, every=None, jitter=0, at=None):
+        """Changes a job's cadence; a run in progress is not interrupted."""
+        with self._lock:
+            self.scheduler.clear(name)
+            self._schedule(self.jobs[name], every, jitter, at)
+
+    def _trigger(self, job):
+        if job.running.is_set():
+            job.skipped += 1
+            elapsed = time.monotonic() - job.started_at
+            if job.deadline and elapsed > job.deadline and not job.overrun_reported:
+                self._report_overrun(job, f"still running after {elapsed:.0f}s")
+            return
+        job.running.set()
+        job.started_at = time.monotonic()
+        job.overrun_reported = False
+        job.executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job.func()
+        except Exception as e:
+            self.on_error(job.name, e)
+        finally:
+            job.last_duration = time.monotonic() - job.started_at
+            job.runs += 1
+            if job.deadline and job.last_duration > job.deadline and not job.overrun_reported:
+                self._report_overrun(job, f"took {job.last_duration:.0f}s")
+            job.running.clear()
+
+    def _report_overrun(self, job, detail):
+        job.overruns += 1
+        job.overrun_reported = True
+        self.on_error(job.name, TimeoutError(f"{detail} (deadline {job.deadline}s)"))
+
+    def run_now(self, name):
+        self._trigger(self.jobs[name])
+
+    def _loop(self):
+        while self.running:
+            # _trigger only hands runs to the job workers, so the lock is held briefly
+            with self._lock:
+                try:
+                    self.scheduler.run_pending()
+                except Exception as e:
+                    self.on_error("scheduler", e)
+                idle = self.scheduler.idle_seconds
+            time.sleep(self.tick if idle is None else min(max(idle, 0.05), self.tick))
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=True):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        for job in self.jobs.values():
+            job.executor.shutdown(wait=wait)
+
+    def status(self):
+        return {
+            name: {
+                'running': job.running.is_set(),
+                'runs': job.runs,
+                'skipped': job.skipped,
+                'overruns': job.overruns,
+                'last_duration': job.last_duration,
+            }
+            for name, job in self.jobs.items()
+        }
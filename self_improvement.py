@@ -5,6 +5,7 @@ import requests
 from .database import get_unresolved_errors, mark_error_resolved, log_error
 from .config import Config
 from .auto_coder import AutoCoder
+from .dispatcher import get_dispatcher, PRIORITY_HIGH
 
 config = Config()
 
@@ -19,7 +20,7 @@ class SelfImprovementSystem:
     def start_self_check(self):
         if config['auto_improvement']:
             self.running = True
-            self.thread = threading.Thread(target=self._self_check_loop, daemon=True)
+            self.thread = threading.Thread(target=self._self_check_loop, name='self-improvement', daemon=True)
             self.thread.start()
             log_error("SELF_IMPROVE", "System started")
 
@@ -48,24 +49,25 @@ class SelfImprovementSystem:
                 return True
 
             # If auto-fix fails, notify admin
-            self.notify_admin(error_id, module, error_text)
+            self.notify_admin(error_id, module, error_text, error.get('occurrences', 1))
             return False
         except Exception as e:
             log_error("AUTO_FIX", f"Error fixing {error_id}: {e}")
             return False
 
-    def notify_admin(self, error_id, module, error_text):
+    def notify_admin(self, error_id, module, error_text, occurrences=1):
         try:
-            for admin_id in config['subscribers']:
-                self.bot.send_message(
-                    admin_id,
-                    f"⚠️ **System Attention Needed**\n\n"
-                    f"Module: `{module}`\n"
-                    f"Error ID: {error_id}\n"
-                    f"Error: `{error_text[:200]}`\n\n"
-                    "Please review when possible",
-                    parse_mode='Markdown'
-                )
+            get_dispatcher(self.bot).broadcast(
+                config['subscribers'],
+                f"⚠️ **System Attention Needed**\n\n"
+                f"Module: `{module}`\n"
+                f"Error ID: {error_id}\n"
+                f"Occurrences: {occurrences}\n"
+                f"Error: `{error_text[:200]}`\n\n"
+                "Please review when possible",
+                priority=PRIORITY_HIGH,
+                coalesce_key='self_improve'
+            )
         except Exception as e:
             log_error("ADMIN_NOTIFY", f"Error: {e}")
 
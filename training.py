@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import logging
+import numpy as np
+import tensorflow as tf
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_SHUFFLE_BUFFER = 2048
+CHECKPOINT_DIR = 'models'
+
+# Кандидаты гиперпараметров для поиска методом successive halving
+SEARCH_SPACE = [
+    {'units': 32, 'dense_units': 16, 'learning_rate': 0.001},
+    {'units': 50, 'dense_units': 25, 'learning_rate': 0.001},
+    {'units': 64, 'dense_units': 32, 'learning_rate': 0.001},
+    {'units': 50, 'dense_units': 25, 'learning_rate': 0.003},
+]
+
+_threading_configured = False
+
+
+def configure_threading(intra_op_threads=0, inter_op_threads=0):
+    """Настраивает пулы потоков TensorFlow (0 — значение по умолчанию).
+
+    Должна вызываться до первой операции TensorFlow, повторные вызовы игнорируются.
+    """
+    global _threading_configured
+    if _threading_configured:
+        return
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        logger.info(f"Потоки TensorFlow: intra_op={intra_op_threads or 'auto'}, "
+                    f"inter_op={inter_op_threads or 'auto'}")
+    except RuntimeError as e:
+        logger.warning(f"Не удалось изменить потоки TensorFlow после инициализации: {e}")
+    _threading_configured = True
+
+
+def make_window_dataset(scaled_data, look_back, target_index, start, end,
+                        batch_size=DEFAULT_BATCH_SIZE, shuffle=False,
+                        shuffle_buffer=DEFAULT_SHUFFLE_BUFFER):
+    """Строит tf.data конвейер окон из матрицы признаков.
+
+    Образец i — окно scaled_data[i - look_back:i] и цель scaled_data[i, target_index],
+    i пробегает [start, end). Окна нарезаются из одного float32 тензора, без
+    материализации массива X в памяти NumPy.
+    """
+    source = tf.constant(np.asarray(scaled_data, dtype=np.float32))
+    offsets = tf.range(-look_back, 0, dtype=tf.int64)
+
+    def to_window(i):
+        return tf.gather(source, i + offsets), source[i, target_index]
+
+    dataset = (tf.data.Dataset.range(start, end)
+               .map(to_window, num_parallel_calls=tf.data.AUTOTUNE)
+               .cache())
+    if shuffle:
+        dataset = dataset.shuffle(min(shuffle_buffer, max(end - start, 1)), reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Пишет в лог скорость обучения (образцов/с) по эпохам."""
+
+    def __init__(self, num_samples):
+        super().__init__()
+        self.num_samples = num_samples
+        self._epoch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._epoch_start
+        loss = (logs or {}).get('loss', float('nan'))
+        logger.info(f"Эпоха {epoch + 1}: {self.num_samples / elapsed:.0f} образцов/с, "
+                    f"loss={loss:.5f}, {elapsed:.2f} сек.")
+
+
+class TimeBudget(tf.keras.callbacks.Callback):
+    """Останавливает обучение по достижении дедлайна (time.monotonic)."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.monotonic() >= self.deadline:
+            logger.info(f"Бюджет времени исчерпан после эпохи {epoch + 1}")
+            self.model.stop_training = True
+
+
+class TrainingController:
+    """Управляет обучением прогнозной модели для символа.
+
+    Ранняя остановка по val_loss, сохранение лучших весов (и дообучение с них
+    при следующем запуске), ограничение по времени на символ и поиск
+    гиперпараметров методом successive halving с кэшированием результата в Config.
+    При persist=False (бэктест) веса и результаты поиска не читаются и не сохраняются.
+    """
+
+    def __init__(self, build_fn, config, max_epochs=50, patience=5, time_budget=300,
+                 search_ttl=7 * 24 * 3600, checkpoint_dir=CHECKPOINT_DIR, persist=True):
+        self.build_fn = build_fn
+        self.config = config
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.time_budget = time_budget
+        self.search_ttl = search_ttl
+        self.checkpoint_dir = checkpoint_dir
+        self.persist = persist
+
+    def _checkpoint_path(self, symbol):
+        safe_symbol = re.sub(r'[^\w\-]', '_', symbol)
+        return os.path.join(self.checkpoint_dir, f"{safe_symbol}.weights.h5")
+
+    def _cached_params(self, symbol, input_shape):
+        if not self.persist:
+            return None
+        entry = self.config.get('lstm_hyperparams', {}).get(symbol)
+        if not entry or list(entry.get('input_shape', [])) != list(input_shape):
+            return None
+        if time.time() - entry.get('searched_at', 0) > self.search_ttl:
+            return None
+        return entry['params']
+
+    def _store_params(self, symbol, input_shape, params, val_loss):
+        if not self.persist:
+            return
+        hyperparams = dict(self.config.get('lstm_hyperparams', {}))
+        hyperparams[symbol] = {
+            'params': params,
+            'val_loss': val_loss,
+            'input_shape': list(input_shape),
+            'searched_at': int(time.time())
+        }
+        self.config['lstm_hyperparams'] = hyperparams
+
+    def search(self, symbol, train_ds, val_ds, input_shape, deadline, min_epochs=2):
+        """Successive halving: все кандидаты получают min_epochs эпох, лучшая
+        половина продолжает обучение с удвоенным числом эпох, и так до одного."""
+        candidates = [(params, self.build_fn(input_shape, **params)) for params in SEARCH_SPACE]
+        scores = {}
+        epochs_done = 0
+        rung_epochs = min_epochs
+
+        while candidates:
+            target_epochs = epochs_done + rung_epochs
+            for i, (params, model) in enumerate(candidates):
+                history = model.fit(train_ds, validation_data=val_ds, initial_epoch=epochs_done,
+                                    epochs=target_epochs, verbose=0, callbacks=[TimeBudget(deadline)])
+                scores[i] = min(history.history.get('val_loss', [np.inf]))
+            ranked = sorted(range(len(candidates)), key=lambda i: scores[i])
+            best_params, best_score = candidates[ranked[0]][0], scores[ranked[0]]
+            logger.info(f"Поиск гиперпараметров {symbol}: {len(candidates)} кандидатов, "
+                        f"{target_epochs} эпох, лучший val_loss={best_score:.5f} ({best_params})")
+
+            if len(candidates) == 1 or time.monotonic() >= deadline:
+                break
+            candidates = [candidates[i] for i in ranked[:max(len(candidates) // 2, 1)]]
+            scores = {}
+            epochs_done = target_epochs
+            rung_epochs *= 2
+
+        self._store_params(symbol, input_shape, best_params, float(best_score))
+        return best_params
+
+    def train(self, symbol, train_ds, val_ds, input_shape, num_samples):
+        """Подбирает (или берёт из кэша) гиперпараметры и обучает модель."""
+        deadline = time.monotonic() + self.time_budget
+
+        params = self._cached_params(symbol, input_shape)
+        if params is None:
+            # На поиск отводится не более половины бюджета
+            search_deadline = time.monotonic() + self.time_budget / 2
+            params = self.search(symbol, train_ds, val_ds, input_shape, search_deadline)
+        else:
+            logger.info(f"Гиперпараметры {symbol} взяты из кэша: {params}")
+
+        model = self.build_fn(input_shape, **params)
+        callbacks = [
+            tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=self.patience,
+                                             restore_best_weights=True),
+            TimeBudget(deadline),
+            ThroughputLogger(num_samples)
+        ]
+
+        checkpoint_path = self._checkpoint_path(symbol)
+        if self.persist:
+            if os.path.exists(checkpoint_path):
+                try:
+                    model.load_weights(checkpoint_path)
+                    logger.info(f"Дообучение {symbol} с сохранённых весов {checkpoint_path}")
+                except Exception as e:
+                    logger.warning(f"Не удалось загрузить веса {checkpoint_path}: {e}")
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            callbacks.append(tf.keras.callbacks.ModelCheckpoint(checkpoint_path, monitor='val_loss',
+                                                                save_best_only=True, save_weights_only=True))
+
+        history = model.fit(train_ds, validation_data=val_ds, epochs=self.max_epochs,
+                            verbose=0, callbacks=callbacks)
+        logger.info(f"Обучение {symbol}: {len(history.history.get('loss', []))} эпох, "
+                    f"лучший val_loss={min(history.history.get('val_loss', [np.nan])):.5f}")
+
+        if self.persist:
+            self.config.set_lstm_model_path(symbol, checkpoint_path)
+        return model, params
@@ -1,24 +1,57 @@
 import re
 import time
 import hashlib
+import threading
+from collections import OrderedDict
 
 
 class DataCache:
-    def __init__(self, ttl=300):
-        self.cache = {}
+    """Cache with a TTL; with max_size the least recently used entries are evicted.
+
+    Expired entries are dropped when they are read and, once the cache is
+    full, swept at most once per TTL, so a cache of ever-new keys stays bounded.
+    """
+
+    def __init__(self, ttl=300, max_size=None):
+        self.cache = OrderedDict()
         self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._next_sweep = 0.0
 
     def get(self, key):
-        item = self.cache.get(key)
-        if item and (time.time() - item['timestamp']) < self.ttl:
-            return item['data']
-        return None
+        with self.lock:
+            item = self.cache.get(key)
+            if item and (time.time() - item['timestamp']) < self.ttl:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return item['data']
+            if item:
+                del self.cache[key]
+            self.misses += 1
+            return None
 
     def set(self, key, data):
-        self.cache[key] = {
-            'data': data,
-            'timestamp': time.time()
-        }
+        with self.lock:
+            self.cache[key] = {
+                'data': data,
+                'timestamp': time.time()
+            }
+            self.cache.move_to_end(key)
+            if self.max_size and len(self.cache) > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # Caller holds self.lock: expired entries go first, then the least recently used
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.ttl
+            for key in [key for key, item in self.cache.items() if now - item['timestamp'] >= self.ttl]:
+                del self.cache[key]
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
 
 
 def is_valid_currency(currency):
@@ -0,0 +1,228 @@
+import math
+import time
+import threading
+import numpy as np
+import pandas as pd
+from .config import Config
+from .database import get_whale_transactions_page, get_whale_transactions_since, get_address_transactions
+
+# Config['whale_rating'] overrides these
+DEFAULT_SETTINGS = {
+    'half_life_hours': 168,     # an address's volume counts half after a week
+    'base_usd': 100000,         # rating 0; every 10x above it adds 20 points, capped at 100
+    'windows_hours': [1, 24, 168],
+}
+BUCKET_SECONDS = 3600
+PAGE_SIZE = 100000
+WATCHED_KEYS = ('whale_rating', 'exchange_addresses')
+
+
+def rating_from_score(score, base_usd):
+    """0-100 rating of a decayed USD volume (works on scalars and arrays)."""
+    ratio = np.maximum(np.asarray(score, dtype=float), 1e-9) / base_usd
+    return np.clip(20 * np.log10(np.maximum(ratio, 1)), 0, 100)
+
+
+class WhaleAnalytics:
+    """Per-address whale ratings and net exchange flows per currency.
+
+    An address's score is the USD volume it sent or received, decayed
+    exponentially with half_life_hours, so a new transaction updates it in
+    O(1). rebuild() computes the same state vectorised over the whole
+    whale_transactions table, page by page. Exchange flows are kept in
+    hourly buckets per currency for the longest configured window; longer
+    windows are answered from the (currency, timestamp) index.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or Config()
+        self.lock = threading.Lock()
+        self.scores = {}        # address -> (score, as_of)
+        self.buckets = {}       # currency -> {hour: [inflow_usd, outflow_usd]}
+        self.loaded = False
+        self.config.subscribe(self._on_settings_change, keys=WATCHED_KEYS)
+
+    def settings(self):
+        return {**DEFAULT_SETTINGS, **(self.config.get('whale_rating') or {})}
+
+    def exchanges(self):
+        return {address.lower() for address in self.config.get('exchange_addresses') or {}}
+
+    def _decay_rate(self, settings):
+        return math.log(2) / (settings['half_life_hours'] * 3600)
+
+    def _on_settings_change(self, key, old, new):
+        # Ratings and flows depend on both settings: recompute on next use
+        with self.lock:
+            self.loaded = False
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.rebuild()
+
+    def rebuild(self, now=None):
+        """Recomputes all scores and flow buckets from the database."""
+        now = now or time.time()
+        settings = self.settings()
+        rate = self._decay_rate(settings)
+        horizon = now - max(settings['windows_hours']) * 3600
+        exchanges = list(self.exchanges())
+
+        scores = pd.Series(dtype=float)
+        flow_parts = []
+        after = 0
+        while True:
+            page = get_whale_transactions_page(after, PAGE_SIZE)
+            if page.empty:
+                break
+            after = int(page['rowid'].iloc[-1])
+            senders = page['from_address'].str.lower()
+            receivers = page['to_address'].str.lower()
+
+            # Both sides of a transfer are credited with its decayed value
+            weights = page['amount_usd'].to_numpy(dtype=float) * np.exp(-rate * (now - page['timestamp'].to_numpy()))
+            credited = pd.Series(np.concatenate([weights, weights]),
+                                 index=np.concatenate([senders.to_numpy(), receivers.to_numpy()]))
+            scores = scores.add(credited.groupby(level=0).sum(), fill_value=0)
+
+            recent = (page['timestamp'] >= horizon).to_numpy()
+            if recent.any():
+                inflows = page['amount_usd'].where(receivers.isin(exchanges), 0.0)
+                outflows = page['amount_usd'].where(senders.isin(exchanges), 0.0)
+                part = pd.DataFrame({
+                    'currency': page['currency'], 'hour': page['timestamp'] // BUCKET_SECONDS * BUCKET_SECONDS,
+                    'inflow': inflows, 'outflow': outflows,
+                })[recent]
+                flow_parts.append(part.groupby(['currency', 'hour'])[['inflow', 'outflow']].sum())
+
+        buckets = {}
+        if flow_parts:
+            flows = pd.concat(flow_parts).groupby(level=[0, 1]).sum()
+            for (currency, hour), (inflow, outflow) in zip(flows.index, flows.to_numpy()):
+                buckets.setdefault(currency, {})[int(hour)] = [float(inflow), float(outflow)]
+        with self.lock:
+            self.scores = {address: (score, now) for address, score in scores.items()}
+            self.buckets = buckets
+            self.loaded = True
+
+    def direction(self, from_address, to_address, exchanges=None):
+        exchanges = self.exchanges() if exchanges is None else exchanges
+        to_exchange, from_exchange = to_address.lower() in exchanges, from_address.lower() in exchanges
+        if to_exchange and not from_exchange:
+            return 'IN'
+        if from_exchange and not to_exchange:
+            return 'OUT'
+        return 'INTERNAL' if to_exchange else 'TRANSFER'
+
+    def add(self, currency, amount_usd, from_address, to_address, timestamp):
+        """Applies one new transaction; returns (direction, rating of the bigger whale)."""
+        self.ensure_loaded()
+        settings = self.settings()
+        rate = self._decay_rate(settings)
+        exchanges = self.exchanges()
+        from_address, to_address = from_address.lower(), to_address.lower()
+        direction = self.direction(from_address, to_address, exchanges)
+
+        with self.lock:
+            for address in {from_address, to_address}:
+                score, as_of = self.scores.get(address, (0.0, timestamp))
+                if timestamp >= as_of:
+                    self.scores[address] = (score * math.exp(-rate * (timestamp - as_of)) + amount_usd, timestamp)
+                else:
+                    self.scores[address] = (score + amount_usd * math.exp(-rate * (as_of - timestamp)), as_of)
+
+            now = time.time()
+            horizon = now - max(settings['windows_hours']) * 3600
+            if timestamp >= horizon:
+                buckets = self.buckets.setdefault(currency, {})
+                hour = int(timestamp) // BUCKET_SECONDS * BUCKET_SECONDS
+                if hour not in buckets:
+                    for old in [h for h in buckets if h < horizon - BUCKET_SECONDS]:
+                        del buckets[old]
+                bucket = buckets.setdefault(hour, [0.0, 0.0])
+                if to_address in exchanges:
+                    bucket[0] += amount_usd
+                if from_address in exchanges:
+                    bucket[1] += amount_usd
+
+            rating = max(self._rating(address, now, rate, settings) for address in (from_address, to_address))
+        return direction, rating
+
+    def _rating(self, address, now, rate, settings):
+        score, as_of = self.scores.get(address, (0.0, now))
+        return float(rating_from_score(score * math.exp(-rate * max(now - as_of, 0)), settings['base_usd']))
+
+    def rating(self, address):
+        self.ensure_loaded()
+        settings = self.settings()
+        with self.lock:
+            return self._rating(address.lower(), time.time(), self._decay_rate(settings), settings)
+
+    def top_addresses(self, n=10):
+        """[(address, rating)] of the n highest-rated addresses."""
+        self.ensure_loaded()
+        settings = self.settings()
+        now = time.time()
+        with self.lock:
+            if not self.scores:
+                return []
+            addresses = list(self.scores)
+            values = np.array([self.scores[a] for a in addresses])
+        current = values[:, 0] * np.exp(-self._decay_rate(settings) * np.maximum(now - values[:, 1], 0))
+        n = min(n, len(addresses))
+        top = np.argpartition(-current, n - 1)[:n]
+        top = top[np.argsort(-current[top])]
+        ratings = rating_from_score(current[top], settings['base_usd'])
+        return [(addresses[i], float(r)) for i, r in zip(top, ratings)]
+
+    def flows(self, currency, windows_hours=None, now=None):
+        """{hours: {'inflow', 'outflow', 'net'}} in USD; net > 0 means coins moving onto exchanges."""
+        self.ensure_loaded()
+        settings = self.settings()
+        windows_hours = windows_hours or settings['windows_hours']
+        now = now or time.time()
+        retained = max(settings['windows_hours'])
+
+        with self.lock:
+            buckets = self.buckets.get(currency, {})
+            hours = np.fromiter(buckets, dtype=float, count=len(buckets))
+            totals = np.array(list(buckets.values()), dtype=float).reshape(-1, 2)
+
+        result = {}
+        for window in windows_hours:
+            if window <= retained:
+                # A bucket counts if it overlaps the window
+                mask = hours + BUCKET_SECONDS > now - window * 3600
+                inflow, outflow = totals[mask].sum(axis=0) if mask.any() else (0.0, 0.0)
+            else:
+                inflow, outflow = self._flows_from_db(currency, now - window * 3600)
+            result[window] = {'inflow': float(inflow), 'outflow': float(outflow), 'net': float(inflow - outflow)}
+        return result
+
+    def _flows_from_db(self, currency, since):
+        df = get_whale_transactions_since(currency, int(since))
+        if df.empty:
+            return 0.0, 0.0
+        exchanges = list(self.exchanges())
+        inflow = df['amount_usd'][df['to_address'].str.lower().isin(exchanges)].sum()
+        outflow = df['amount_usd'][df['from_address'].str.lower().isin(exchanges)].sum()
+        return inflow, outflow
+
+    def address_report(self, address, limit=20):
+        return {
+            'address': address.lower(),
+            'rating': self.rating(address),
+            'transactions': get_address_transactions(address.lower(), limit),
+        }
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_whale_analytics():
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = WhaleAnalytics()
+        return _analytics